@@ -0,0 +1,223 @@
+"""Headless batch analysis of a corpus of Scratch projects
+
+Example:
+    python batch.py projects/ --output-dir results/ --formats csv json
+
+Each project is parsed and exported in a worker process. Per-project
+results (including parse phase timings and counters under 'parse_stats')
+are appended to results.jsonl as they complete, and the SHA-256
+of every successfully processed file is appended to manifest.txt so an
+interrupted run can be restarted with the same arguments and will skip
+work that is already done. A summary.json is written at the end.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from cache import ParseCache
+from json_backend import BACKEND_ORDER
+from parser import ScratchParser
+
+# {format: (file extension, exporter method, extra method arguments...)}
+EXPORT_FORMATS = {
+    'csv': ('.csv', 'export_edge_list'),
+    'json': ('.json', 'export_to_json'),
+    'broadcast-jsonl': ('.broadcast.jsonl', 'export_report_records', 'broadcast'),
+    'receive-jsonl': ('.receive.jsonl', 'export_report_records', 'receive'),
+    'layout-jsonl': ('.layout.jsonl', 'export_report_records', 'script_layout'),
+}
+
+# Per-worker state, set up once by _init_worker
+_parser = None
+_completed = frozenset()
+
+
+def find_projects(inputs, file_list=None):
+    """Collect .sb3 paths from files, directories (recursively) and a list file"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith('.sb3'):
+                        paths.append(os.path.join(root, name))
+        else:
+            paths.append(item)
+
+    if file_list:
+        with open(file_list, 'r') as f:
+            paths.extend(line.strip() for line in f if line.strip())
+
+    return paths
+
+
+def load_manifest(manifest_path):
+    """Load the set of file hashes completed by previous runs"""
+    if not os.path.exists(manifest_path):
+        return set()
+    with open(manifest_path, 'r') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _init_worker(completed, cache_dir, use_cache, streaming, json_backend):
+    """Set up the parser and completed-hash set once per worker process"""
+    global _parser, _completed
+    # One parser for every project this worker handles, so its name table
+    # (bounded, see model.NameTable) is shared across the run
+    _parser = ScratchParser(streaming=streaming, cache=ParseCache(cache_dir) if use_cache else None,
+                            json_backend=json_backend, collect_stats=True)
+    _completed = frozenset(completed)
+
+
+def analyze_project(path, output_dir, formats):
+    """Parse and export one project; return a JSON-serialisable result record"""
+    started = time.perf_counter()
+    result = {'path': path, 'hash': None, 'status': 'ok'}
+
+    try:
+        result['hash'] = file_hash = hash_file(path)
+        if file_hash in _completed:
+            result['status'] = 'skipped'
+            return result
+
+        # Raise so the record carries the actual failure, e.g. BadZipFile
+        model = _parser.parse_sb3(path, raise_errors=True)
+        # Phase timings and counters help spot pathological projects
+        stats = model.stats.to_dict()
+        del stats['source']
+        result['parse_stats'] = stats
+
+        result['sprites'] = len(model.sprites)
+        result['events'] = len(model.events)
+        result['scripts'] = sum(model.script_count(sprite, event) for sprite, event in model.scripts)
+        result['connections'] = len(model.connections)
+        result['messages'] = len(model.broadcasters)
+
+        if formats:
+            # Imported here so a parse-only run doesn't pay for pandas/reportlab
+            from export import CodeOramaExporter
+            exporter = CodeOramaExporter(model)
+            result['outputs'] = {}
+            for fmt in formats:
+                extension, method, *args = EXPORT_FORMATS[fmt]
+                output_path = os.path.join(output_dir, 'exports', file_hash + extension)
+                getattr(exporter, method)(output_path, *args)
+                result['outputs'][fmt] = output_path
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+
+    result['seconds'] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def run_batch(paths, output_dir, formats=('csv', 'json'), workers=None,
+              cache_dir=None, use_cache=True, streaming=False, json_backend=None):
+    """Analyze paths across a process pool and return the run summary"""
+    os.makedirs(os.path.join(output_dir, 'exports'), exist_ok=True)
+    manifest_path = os.path.join(output_dir, 'manifest.txt')
+    results_path = os.path.join(output_dir, 'results.jsonl')
+    completed = load_manifest(manifest_path)
+
+    workers = workers or os.cpu_count() or 1
+    summary = {
+        'total': len(paths),
+        'ok': 0,
+        'skipped': 0,
+        'error': 0,
+        'sprites': 0,
+        'connections': 0,
+    }
+    started = time.perf_counter()
+
+    with open(results_path, 'a') as results_file, \
+            open(manifest_path, 'a') as manifest_file, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(completed, cache_dir, use_cache, streaming,
+                                          json_backend)) as executor:
+        pending = set()
+        remaining = iter(paths)
+        # Keep a bounded window of in-flight work so huge corpora don't
+        # create one future per file up front
+        window = workers * 4
+
+        while True:
+            for path in remaining:
+                pending.add(executor.submit(analyze_project, path, output_dir, formats))
+                if len(pending) >= window:
+                    break
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                status = result['status']
+                summary[status] += 1
+                if status == 'skipped':
+                    continue
+
+                results_file.write(json.dumps(result) + '\n')
+                results_file.flush()
+                if status == 'ok':
+                    summary['sprites'] += result['sprites']
+                    summary['connections'] += result['connections']
+                    # Only record the hash once its outputs are on disk
+                    manifest_file.write(result['hash'] + '\n')
+                    manifest_file.flush()
+
+    summary['seconds'] = round(time.perf_counter() - started, 2)
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Batch-analyze Scratch .sb3 projects")
+    arg_parser.add_argument('inputs', nargs='*', help=".sb3 files or directories to scan")
+    arg_parser.add_argument('--file-list', help="Text file with one .sb3 path per line")
+    arg_parser.add_argument('--output-dir', required=True, help="Directory for results, exports and manifest")
+    arg_parser.add_argument('--formats', nargs='*', default=['csv', 'json'], choices=sorted(EXPORT_FORMATS),
+                            help="Exports to write per project (default: csv json)")
+    arg_parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    arg_parser.add_argument('--cache-dir', default=None, help="Parse cache directory")
+    arg_parser.add_argument('--no-cache', action='store_true', help="Disable the on-disk parse cache")
+    arg_parser.add_argument('--streaming', action='store_true', help="Use the low-memory streaming parser")
+    arg_parser.add_argument('--json-backend', choices=BACKEND_ORDER, default=None,
+                            help="JSON decoder to use (default: fastest installed)")
+    args = arg_parser.parse_args(argv)
+
+    paths = find_projects(args.inputs, args.file_list)
+    if not paths:
+        arg_parser.error("no .sb3 projects found")
+
+    summary = run_batch(
+        paths,
+        args.output_dir,
+        formats=args.formats,
+        workers=args.workers,
+        cache_dir=args.cache_dir,
+        use_cache=not args.no_cache,
+        streaming=args.streaming,
+        json_backend=args.json_backend
+    )
+    print(json.dumps(summary, indent=2))
+    return 1 if summary['error'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
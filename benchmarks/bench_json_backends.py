@@ -0,0 +1,77 @@
+"""Compare JSON backends for loading .sb3 projects
+
+Usage:
+    python benchmarks/bench_json_backends.py [--repeat N] [--sprites N]
+
+Times the raw project.json decode and the full ScratchParser.parse_sb3
+for every installed backend on the bundled sb3/ samples and on a
+synthetic large project.
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from json_backend import available_backends, get_json_loader  # noqa: E402
+from parser import ScratchParser  # noqa: E402
+from synthetic import make_project, write_sb3  # noqa: E402
+
+
+def best_time(func, repeat):
+    """Best wall-clock time of repeat calls, in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--sprites', type=int, default=150, help="Sprites in the synthetic project")
+    args = arg_parser.parse_args()
+
+    backends = available_backends()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        synthetic_path = write_sb3(
+            os.path.join(tmp_dir, 'synthetic.sb3'),
+            make_project(n_sprites=args.sprites, scripts_per_sprite=30, blocks_per_script=20, n_messages=60)
+        )
+        projects = sorted(glob.glob(os.path.join(ROOT, 'sb3', '*.sb3'))) + [synthetic_path]
+
+        header = f"{'project':<32} {'size':>9}  " + "  ".join(
+            f"{name + ' decode':>15} {name + ' parse':>15}" for name in backends)
+        print(header)
+        print('-' * len(header))
+
+        for path in projects:
+            with zipfile.ZipFile(path) as zip_ref:
+                data = zip_ref.read('project.json')
+
+            cells = []
+            for name in backends:
+                loads = get_json_loader(name)
+                decode_ms = best_time(lambda: loads(data), args.repeat)
+                parse_ms = best_time(lambda: ScratchParser(json_backend=name).parse_sb3(path), args.repeat)
+                cells.append((name, decode_ms, parse_ms))
+
+            stdlib = next((c for c in cells if c[0] == 'json'), None)
+            row = f"{os.path.basename(path)[:32]:<32} {len(data) / 1024:>7.0f}KB  "
+            row += "  ".join(f"{d:>12.2f} ms {p:>12.2f} ms" for _, d, p in cells)
+            if stdlib:
+                fastest = min(cells, key=lambda c: c[1])
+                row += f"   decode speedup {stdlib[1] / fastest[1]:.1f}x ({fastest[0]})"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Check that a reused ScratchParser stays the same size across many uploads
+
+Usage:
+    python benchmarks/bench_parser_memory.py [--uploads N] [--every N]
+
+Feeds one parser a stream of small in-memory .sb3 uploads whose sprite
+and message names are all different, as a long-lived service would see,
+and drops every model straight away. Every --every uploads it prints the
+names held by the parser's NameTable and the Python heap still allocated
+(tracemalloc, after a collection). Both should level off once the table
+reaches NameTable.max_names instead of growing with the upload count.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import sys
+import tracemalloc
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from parser import ScratchParser  # noqa: E402
+from synthetic import make_project  # noqa: E402
+
+
+def make_upload(template, index):
+    """Return .sb3 bytes of the template with names unique to this upload"""
+    project_json = template.replace('Sprite', f'Upload{index}Sprite').replace('message', f'upload{index}message')
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.writestr('project.json', project_json)
+    return buffer.getvalue()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--uploads', type=int, default=6000)
+    arg_parser.add_argument('--every', type=int, default=500)
+    args = arg_parser.parse_args()
+
+    template = json.dumps(make_project(n_sprites=4, scripts_per_sprite=4, blocks_per_script=8, n_messages=3))
+    parser = ScratchParser()
+    tracemalloc.start()
+    print(f"{'uploads':>8} {'names':>8} {'heap':>10}")
+    for index in range(1, args.uploads + 1):
+        parser.parse_sb3(make_upload(template, index))
+        if index % args.every == 0:
+            gc.collect()
+            heap_kb = tracemalloc.get_traced_memory()[0] / 1024
+            print(f"{index:>8} {len(parser.symbols):>8} {heap_kb:>7.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
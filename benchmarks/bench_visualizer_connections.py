@@ -0,0 +1,108 @@
+"""Time connection drawing in the grid visualizer on projects with many connections
+
+Usage:
+    python benchmarks/bench_visualizer_connections.py [--styles ...] [--sprites N ...]
+
+Builds synthetic projects of increasing size and lays out the grid. It
+then times finding every connection's endpoints with a linear scan of
+cell_contents (how connection drawing used to work) and with the
+visualizer's cell indexes. Finally it times each edge style's whole
+connection pass, without rendering.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from parser import ScratchParser  # noqa: E402
+from synthetic import make_project, write_sb3  # noqa: E402
+from visualizer import CodeOramaVisualizer  # noqa: E402
+
+STYLE_METHODS = {
+    'straight': '_add_straight_connections',
+    'curved': '_add_curved_connections',
+    'improved': '_add_improved_connections',
+}
+
+
+def scan_endpoints(visualizer, connections):
+    """Resolve endpoints by scanning every cell per connection and sprite"""
+    found = 0
+    for source_sprite, source_event, _, target_event in connections:
+        source_key = next((k for k in visualizer.cell_contents
+                           if k[0] == source_sprite and k[1] == source_event), None)
+        if source_key:
+            for sprite in visualizer.sprite_positions:
+                found += len([k for k in visualizer.cell_contents
+                              if k[0] == sprite and k[1] == target_event])
+    return found
+
+
+def indexed_endpoints(visualizer, connections):
+    """Resolve endpoints through the visualizer's cell indexes"""
+    found = 0
+    for source_sprite, source_event, _, target_event in connections:
+        if visualizer.cell_index.get((source_sprite, source_event)):
+            for _, cells in visualizer.event_index.get(target_event, ()):
+                found += len(cells)
+    return found
+
+
+def time_lookups(model):
+    """Seconds to resolve all endpoints by scanning and through the indexes"""
+    visualizer = CodeOramaVisualizer()
+    visualizer.visualize({'sprites': model.sprites, 'events': model.events,
+                          'scripts': model.scripts, 'connections': []})
+    timings = []
+    results = []
+    for lookup in (scan_endpoints, indexed_endpoints):
+        started = time.perf_counter()
+        results.append(lookup(visualizer, model.connections))
+        timings.append(time.perf_counter() - started)
+    assert results[0] == results[1], "index and scan disagree"
+    return timings
+
+
+def time_connections(model, style):
+    """Seconds spent drawing one edge style's connections onto a fresh grid"""
+    visualizer = CodeOramaVisualizer()
+    visualizer.visualize({'sprites': model.sprites, 'events': model.events,
+                          'scripts': model.scripts, 'connections': []})
+    started = time.perf_counter()
+    getattr(visualizer, STYLE_METHODS[style])(model.connections, show_message_names=False)
+    return time.perf_counter() - started
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--styles', nargs='*', default=['straight'], choices=sorted(STYLE_METHODS),
+                            help="Edge styles whose full connection pass is timed (default: straight)")
+    arg_parser.add_argument('--sprites', type=int, nargs='*', default=[20, 40, 80])
+    args = arg_parser.parse_args()
+
+    print(f"{'sprites':>8} {'cells':>7} {'connections':>12} {'scan':>10} {'index':>10} "
+          + " ".join(f"{style:>10}" for style in args.styles))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_sprites in args.sprites:
+            path = write_sb3(
+                os.path.join(tmp_dir, f'synthetic_{n_sprites}.sb3'),
+                make_project(n_sprites=n_sprites, scripts_per_sprite=20, blocks_per_script=12,
+                             n_messages=max(10, n_sprites))
+            )
+            model = ScratchParser().parse_sb3(path)
+            cells = sum(model.script_count(sprite, event) for sprite, event in model.scripts)
+            timings = time_lookups(model) + [time_connections(model, style) for style in args.styles]
+            print(f"{n_sprites:>8} {cells:>7} {len(model.connections):>12} "
+                  + " ".join(f"{seconds * 1000:>7.1f} ms" for seconds in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import json
+import random
+import zipfile
+
+
+def make_project(n_sprites=50, scripts_per_sprite=20, blocks_per_script=15,
+                 n_messages=30, assets_per_sprite=5, seed=0):
+    """Build a synthetic Scratch project.json dict with broadcast traffic
+
+    Scripts start with a flag, key or receive hat; a share of the body
+    blocks are broadcasts of random messages, some of them nested inside
+    control_repeat substacks. Costume metadata is included so loaders
+    see a realistic amount of data they do not use.
+    """
+    rng = random.Random(seed)
+    messages = [f"message{i}" for i in range(n_messages)]
+    targets = []
+
+    for sprite_idx in range(n_sprites):
+        blocks = {}
+        for script_idx in range(scripts_per_sprite):
+            prefix = f"t{sprite_idx}s{script_idx}"
+            hat_id = prefix + "h"
+            kind = rng.random()
+            if kind < 0.3:
+                blocks[hat_id] = _block('event_whenflagclicked', top=True)
+            elif kind < 0.4:
+                blocks[hat_id] = _block('event_whenkeypressed', top=True,
+                                        fields={'KEY_OPTION': [rng.choice('abcdef'), None]})
+            else:
+                message = rng.choice(messages)
+                blocks[hat_id] = _block('event_whenbroadcastreceived', top=True,
+                                        fields={'BROADCAST_OPTION': [message, 'id-' + message]})
+
+            previous_id = hat_id
+            for block_idx in range(blocks_per_script):
+                block_id = f"{prefix}b{block_idx}"
+                roll = rng.random()
+                if roll < 0.15:
+                    message = rng.choice(messages)
+                    blocks[block_id] = _block(
+                        rng.choice(['event_broadcast', 'event_broadcastandwait']),
+                        parent=previous_id,
+                        inputs={'BROADCAST_INPUT': [1, [11, message, 'id-' + message]]}
+                    )
+                elif roll < 0.2:
+                    # A loop whose body is a single broadcast
+                    message = rng.choice(messages)
+                    inner_id = block_id + "i"
+                    blocks[inner_id] = _block(
+                        'event_broadcast', parent=block_id,
+                        inputs={'BROADCAST_INPUT': [1, [11, message, 'id-' + message]]}
+                    )
+                    blocks[block_id] = _block('control_repeat', parent=previous_id,
+                                              inputs={'TIMES': [1, [6, "10"]], 'SUBSTACK': [2, inner_id]})
+                else:
+                    blocks[block_id] = _block(
+                        rng.choice(['motion_movesteps', 'looks_say', 'control_wait', 'sound_play']),
+                        parent=previous_id,
+                        inputs={'VALUE': [1, [4, str(rng.randint(1, 100))]]}
+                    )
+                blocks[previous_id]['next'] = block_id
+                previous_id = block_id
+
+        targets.append({
+            'isStage': sprite_idx == 0,
+            'name': 'Stage' if sprite_idx == 0 else f"Sprite{sprite_idx}",
+            'variables': {f"var{i}": [f"v{i}", 0] for i in range(5)},
+            'lists': {},
+            'broadcasts': {'id-' + m: m for m in messages} if sprite_idx == 0 else {},
+            'blocks': blocks,
+            'comments': {},
+            'currentCostume': 0,
+            'costumes': [
+                {'name': f"costume{i}", 'bitmapResolution': 1, 'dataFormat': 'svg',
+                 'assetId': f"{rng.getrandbits(128):032x}", 'md5ext': f"{rng.getrandbits(128):032x}.svg",
+                 'rotationCenterX': 48, 'rotationCenterY': 50}
+                for i in range(assets_per_sprite)
+            ],
+            'sounds': [],
+            'volume': 100,
+            'layerOrder': sprite_idx,
+        })
+
+    return {'targets': targets, 'monitors': [], 'extensions': [], 'meta': {'semver': '3.0.0'}}
+
+
+def _block(opcode, parent=None, top=False, inputs=None, fields=None):
+    block = {
+        'opcode': opcode,
+        'next': None,
+        'parent': parent,
+        'inputs': inputs or {},
+        'fields': fields or {},
+        'shadow': False,
+        'topLevel': top,
+    }
+    if top:
+        block['x'] = 0
+        block['y'] = 0
+    return block
+
+
+def write_sb3(path, project):
+    """Write a project dict as an .sb3 archive containing only project.json"""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.writestr('project.json', json.dumps(project))
+    return path
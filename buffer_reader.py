@@ -0,0 +1,63 @@
+import io
+
+
+class BufferReader(io.RawIOBase):
+    """Read-only, seekable binary stream over an in-memory buffer
+
+    Accepts bytes, bytearray, memoryview or anything else supporting the
+    buffer protocol. Unlike io.BytesIO it never copies the whole buffer,
+    so an uploaded .sb3 can be opened with zipfile without duplicating it;
+    only the ranges actually read are copied out.
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._pos + offset
+        elif whence == io.SEEK_END:
+            position = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            # Same error as a real file, which zipfile relies on for short inputs
+            raise OSError("Invalid argument: negative seek position")
+        self._pos = position
+        return position
+
+    def read(self, size=-1):
+        """Return up to size bytes (all remaining bytes if size is negative)"""
+        start = min(self._pos, len(self._view))
+        end = len(self._view) if size is None or size < 0 else min(start + size, len(self._view))
+        self._pos = max(self._pos, end)
+        return self._view[start:end].tobytes()
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buffer):
+        """Copy the next bytes straight into a writable buffer"""
+        target = memoryview(buffer).cast('B')
+        start = min(self._pos, len(self._view))
+        count = min(len(target), len(self._view) - start)
+        target[:count] = self._view[start:start + count]
+        self._pos = max(self._pos, start + count)
+        return count
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
@@ -0,0 +1,195 @@
+import contextlib
+import gc
+import os
+import pickle
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def default_cache_dir():
+    """Return the per-user directory used for cached parse results"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ecodeorama', 'parse')
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """Open path for reading and writing while holding an exclusive lock on it
+
+    The lock is held against other processes and against other opens of
+    the same file in this process, so it also serialises threads.
+    """
+    with open(path, 'a+b') as f:
+        f.seek(0)
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ParseCache:
+    """Content-addressed on-disk cache of parsed Scratch projects
+
+    Entries are keyed by the SHA-256 of project.json plus the parser
+    version and stored as pickles. Reading an entry refreshes its
+    modification time, and once the cache grows past max_size the least
+    recently used entries are evicted.
+
+    The total size of the entries is kept in a file in the cache directory
+    and only changed under a file lock, so the cap holds for the directory
+    even when several processes (e.g. batch workers) write to it at once.
+    """
+
+    EXTENSION = '.pickle'
+    SIZE_FILE = 'size'
+
+    def __init__(self, cache_dir=None, max_size=256 * 1024 * 1024):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Running total shared by every ParseCache on this directory, so puts
+        # don't have to rescan it
+        self._size_path = os.path.join(self.cache_dir, self.SIZE_FILE)
+
+    def make_key(self, content_hash, parser_version):
+        """Build the cache key for a project.json digest and parser version"""
+        return f'{content_hash}-v{parser_version}'
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        path = self._path(key)
+        # Unpickling allocates many small containers; pausing the cyclic
+        # garbage collector meanwhile makes loads several times faster
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Corrupt or incompatible entry - drop it and treat as a miss
+            print(f"Discarding unreadable cache entry {key}: {e}")
+            self._discard(path)
+            return None
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        # Mark as recently used for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        """Store value under key and evict old entries if over the size cap"""
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            with _locked(self._size_path) as size_file:
+                # Replacing an existing entry frees its old size
+                old_size = self._size(path)
+                # Atomic rename so concurrent readers never see partial entries
+                os.replace(tmp_path, path)
+                total = self._read_total(size_file)
+                if total is None:
+                    total = sum(size for _, size, _ in self._entries())
+                else:
+                    total += self._size(path) - old_size
+                if total > self.max_size:
+                    total = self._evict()
+                self._write_total(size_file, total)
+        except Exception:
+            self._remove(tmp_path)
+            raise
+
+    def clear(self):
+        """Remove every cached entry"""
+        with _locked(self._size_path) as size_file:
+            for path, _, _ in self._entries():
+                self._remove(path)
+            self._write_total(size_file, 0)
+
+    def _discard(self, path):
+        """Remove one entry and take its size off the shared total"""
+        with _locked(self._size_path) as size_file:
+            size = self._size(path)
+            self._remove(path)
+            total = self._read_total(size_file)
+            if total is not None:
+                self._write_total(size_file, max(0, total - size))
+
+    def _evict(self):
+        """Remove least recently used entries until under 90% of the size cap
+
+        Rescans the directory, so the returned total also corrects any drift
+        (e.g. entries deleted by hand). Callers hold the size file lock.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_size * 0.9
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            self._remove(path)
+            total -= size
+        return total
+
+    def _read_total(self, size_file):
+        """Return the total stored in the locked size file, or None if it has none"""
+        size_file.seek(0)
+        try:
+            return int(size_file.read())
+        except ValueError:
+            return None
+
+    def _write_total(self, size_file, total):
+        size_file.seek(0)
+        size_file.truncate()
+        size_file.write(str(total).encode('ascii'))
+        size_file.flush()
+
+    def _entries(self):
+        """List (path, size, mtime) for every entry in the cache directory"""
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(self.EXTENSION):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.EXTENSION)
+
+    def _size(self, path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
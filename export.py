@@ -9,30 +9,22 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
 
+from model import BROADCAST_OPCODES, ProjectModel, message_name
+from text_reports import TextReportGenerator
+
 class CodeOramaExporter:
     """Handles export of CodeOrama visualizations to different formats"""
     
     def __init__(self, codeorama_data, config=None):
-        self.sprites = codeorama_data['sprites']
-        self.events = codeorama_data['events']
-        self.scripts = codeorama_data['scripts']
-        self.connections = codeorama_data['connections']
         self.config = config or {}
         
-        # Apply custom ordering if provided
-        if self.config and 'sprite_order' in self.config:
-            # Use only sprites that exist in the data
-            sprite_order = [s for s in self.config['sprite_order'] if s in self.sprites]
-            # Add any sprites not in the order
-            sprite_order.extend([s for s in self.sprites if s not in sprite_order])
-            self.sprites = sprite_order
-        
-        if self.config and 'event_order' in self.config:
-            # Use only events that exist in the data
-            event_order = [e for e in self.config['event_order'] if e in self.events]
-            # Add any events not in the order
-            event_order.extend([e for e in self.events if e not in event_order])
-            self.events = event_order
+        # Apply custom ordering if provided; the reordered model keeps its
+        # receiver indexes in the configured column order
+        self.model = ProjectModel.from_data(codeorama_data).apply_config(self.config)
+        self.sprites = self.model.sprites
+        self.events = self.model.events
+        self.scripts = self.model.scripts
+        self.connections = self.model.connections
     
     def export_to_pdf(self, output_path):
         """Export CodeOrama to a formatted PDF document"""
@@ -96,18 +88,17 @@ class CodeOramaExporter:
         for source_sprite, source_event, _, target_event in self.connections:
             if source_sprite and source_event and target_event:
                 # Find source cell position
-                source_col = self.sprites.index(source_sprite) + 1  # +1 for header column
-                source_row = self.events.index(source_event) + 1  # +1 for header row
+                source_col = self.model.sprite_rank[source_sprite] + 1  # +1 for header column
+                source_row = self.model.event_rank[source_event] + 1  # +1 for header row
                 
                 # Find all receiving sprites
-                for sprite_idx, sprite in enumerate(self.sprites):
-                    if (sprite, target_event) in self.scripts:
-                        target_col = sprite_idx + 1  # +1 for header column
-                        target_row = self.events.index(target_event) + 1  # +1 for header row
-                        
-                        # Highlight cells with broadcasts/receives
-                        style.add('BACKGROUND', (source_col, source_row), (source_col, source_row), colors.lightblue)
-                        style.add('BACKGROUND', (target_col, target_row), (target_col, target_row), colors.lightyellow)
+                for sprite in self.model.get_event_sprites(target_event):
+                    target_col = self.model.sprite_rank[sprite] + 1  # +1 for header column
+                    target_row = self.model.event_rank[target_event] + 1  # +1 for header row
+                    
+                    # Highlight cells with broadcasts/receives
+                    style.add('BACKGROUND', (source_col, source_row), (source_col, source_row), colors.lightblue)
+                    style.add('BACKGROUND', (target_col, target_row), (target_col, target_row), colors.lightyellow)
         
         table.setStyle(style)
         elements.append(table)
@@ -117,14 +108,10 @@ class CodeOramaExporter:
         elements.append(Paragraph("Message Connections:", header_style))
         
         for source_sprite, source_event, _, target_event in self.connections:
-            if source_sprite and source_event and target_event and target_event.startswith('receive_'):
-                message = target_event.replace('receive_', '')
-                
+            message = message_name(target_event)
+            if source_sprite and source_event and message is not None:
                 # Find all receiving sprites
-                receivers = []
-                for sprite in self.sprites:
-                    if (sprite, target_event) in self.scripts:
-                        receivers.append(sprite)
+                receivers = self.model.get_receivers(message)
                 
                 if receivers:
                     connection_text = f"From '{source_sprite}' (event '{self._format_event_name(source_event)}') "
@@ -157,7 +144,7 @@ class CodeOramaExporter:
                 cells = []
                 for sprite in self.sprites:
                     if (sprite, event) in self.scripts:
-                        script_count = len(self.scripts[(sprite, event)])
+                        script_count = self.model.script_count(sprite, event)
                         cells.append(f"{script_count} script(s)")
                     else:
                         cells.append("-")
@@ -175,45 +162,32 @@ class CodeOramaExporter:
                 f.write(f"SPRITE: {sprite}\n")
                 f.write("=" * (len(sprite) + 8) + "\n\n")
                 
-                # Get all scripts for this sprite
-                sprite_scripts = {event: scripts for (s, event), scripts in self.scripts.items() if s == sprite}
-                
-                for event in self.events:
-                    if event in sprite_scripts:
-                        f.write(f"EVENT: {self._format_event_name(event)}\n")
-                        f.write("-" * (len(event) + 7) + "\n")
+                # Events this sprite has scripts for, already in row order
+                for event in self.model.get_sprite_events(sprite):
+                    f.write(f"EVENT: {self._format_event_name(event)}\n")
+                    f.write("-" * (len(event) + 7) + "\n")
+                    
+                    # For each script in this event
+                    for script_idx, script in enumerate(self.scripts[(sprite, event)]):
+                        f.write(f"Script #{script_idx + 1}:\n")
                         
-                        # For each script in this event
-                        for script_idx, script in enumerate(sprite_scripts[event]):
-                            f.write(f"Script #{script_idx + 1}:\n")
+                        # Print blocks with special handling for broadcasts
+                        for block in script:
+                            block_text = f"  {block.opcode}"
                             
-                            # Print blocks with special handling for broadcasts
-                            for block in script:
-                                block_text = f"  {block['opcode']}"
-                                
-                                # Add special annotations for broadcasts and receives
-                                if block['opcode'] == 'event_broadcast' or block['opcode'] == 'event_broadcastandwait':
-                                    # Find the message by looking for connections from this sprite/event
-                                    matching_connections = [conn for conn in self.connections 
-                                                          if conn[0] == sprite and conn[1] == event]
-                                    
-                                    for conn in matching_connections:
-                                        if conn[3] and conn[3].startswith('receive_'):
-                                            msg = conn[3].replace('receive_', '')
-                                            block_text += f" '{msg}'"
-                                            
-                                            # Add receivers
-                                            receivers = []
-                                            for s in self.sprites:
-                                                if (s, conn[3]) in self.scripts:
-                                                    receivers.append(s)
-                                            
-                                            if receivers:
-                                                block_text += " → " + ", ".join(receivers)
+                            # Add special annotations for broadcasts and receives
+                            if block.opcode in BROADCAST_OPCODES and block.message:
+                                msg = block.message
+                                block_text += f" '{msg}'"
                                 
-                                f.write(block_text + "\n")
+                                # Add receivers
+                                receivers = self.model.get_receivers(msg)
+                                if receivers:
+                                    block_text += " → " + ", ".join(receivers)
                             
-                            f.write("\n")
+                            f.write(block_text + "\n")
+                        
+                        f.write("\n")
                 
                 f.write("\n\n")
             
@@ -222,14 +196,10 @@ class CodeOramaExporter:
             f.write("==================\n\n")
             
             for source_sprite, source_event, _, target_event in self.connections:
-                if source_sprite and source_event and target_event and target_event.startswith('receive_'):
-                    message = target_event.replace('receive_', '')
-                    
+                message = message_name(target_event)
+                if source_sprite and source_event and message is not None:
                     # Find all receiving sprites
-                    receivers = []
-                    for sprite in self.sprites:
-                        if (sprite, target_event) in self.scripts:
-                            receivers.append(sprite)
+                    receivers = self.model.get_receivers(message)
                     
                     if receivers:
                         connection_text = f"From '{source_sprite}' (event '{self._format_event_name(source_event)}') "
@@ -247,19 +217,17 @@ class CodeOramaExporter:
             
             # Write edges
             for source_sprite, source_event, _, target_event in self.connections:
-                if source_sprite and source_event and target_event and target_event.startswith('receive_'):
-                    message = target_event.replace('receive_', '')
-                    
+                message = message_name(target_event)
+                if source_sprite and source_event and message is not None:
                     # For each receiving sprite, write an edge
-                    for sprite in self.sprites:
-                        if (sprite, target_event) in self.scripts:
-                            writer.writerow([
-                                source_sprite, 
-                                self._format_event_name(source_event),
-                                message,
-                                sprite,
-                                self._format_event_name(target_event)
-                            ])
+                    for sprite in self.model.get_receivers(message):
+                        writer.writerow([
+                            source_sprite, 
+                            self._format_event_name(source_event),
+                            message,
+                            sprite,
+                            self._format_event_name(target_event)
+                        ])
         
         return True
     
@@ -284,7 +252,7 @@ class CodeOramaExporter:
             for sprite in self.sprites:
                 if (sprite, event) in self.scripts:
                     # Count scripts for this cell
-                    script_count = len(self.scripts[(sprite, event)])
+                    script_count = self.model.script_count(sprite, event)
                     row.append(f"{script_count} script(s)")
                 else:
                     row.append("")
@@ -303,18 +271,16 @@ class CodeOramaExporter:
         
         # Add rows for each connection
         for source_sprite, source_event, _, target_event in self.connections:
-            if source_sprite and source_event and target_event and target_event.startswith('receive_'):
-                message = target_event.replace('receive_', '')
-                
+            message = message_name(target_event)
+            if source_sprite and source_event and message is not None:
                 # For each receiving sprite, add a row
-                for sprite in self.sprites:
-                    if (sprite, target_event) in self.scripts:
-                        connections_data.append([
-                            source_sprite,
-                            self._format_event_name(source_event),
-                            message,
-                            sprite
-                        ])
+                for sprite in self.model.get_receivers(message):
+                    connections_data.append([
+                        source_sprite,
+                        self._format_event_name(source_event),
+                        message,
+                        sprite
+                    ])
         
         # Convert to DataFrame and write to Excel
         df_connections = pd.DataFrame(connections_data[1:], columns=connections_data[0])
@@ -334,7 +300,7 @@ class CodeOramaExporter:
                     self._format_event_name(event),
                     i + 1,
                     len(script),
-                    script[0]['opcode'] if script else 'Empty Script'
+                    script[0].opcode if script else 'Empty Script'
                 ])
         
         # Convert to DataFrame and write to Excel
@@ -345,6 +311,12 @@ class CodeOramaExporter:
         writer.save()
         return True
     
+    def export_report_records(self, output_path, report_type):
+        """Export a broadcast, receive or script layout report as JSON lines"""
+        with open(output_path, 'wb') as f:
+            TextReportGenerator(self.model).write_records(report_type, f)
+        return True
+    
     def export_to_json(self, output_path):
         """Export CodeOrama to JSON format for use with other tools"""
         export_data = {
@@ -368,26 +340,24 @@ class CodeOramaExporter:
             for script in script_list:
                 script_details = {
                     'block_count': len(script),
-                    'first_block': script[0]['opcode'] if script else 'Empty Script',
-                    'blocks': [block['opcode'] for block in script]
+                    'first_block': script[0].opcode if script else 'Empty Script',
+                    'blocks': script.opcodes
                 }
                 export_data['grid'][sprite][event]['scripts'].append(script_details)
         
         # Add connection data
         for source_sprite, source_event, _, target_event in self.connections:
-            if source_sprite and source_event and target_event and target_event.startswith('receive_'):
-                message = target_event.replace('receive_', '')
-                
+            message = message_name(target_event)
+            if source_sprite and source_event and message is not None:
                 # Find all receiving sprites
-                for sprite in self.sprites:
-                    if (sprite, target_event) in self.scripts:
-                        export_data['connections'].append({
-                            'source_sprite': source_sprite,
-                            'source_event': source_event,
-                            'message': message,
-                            'target_sprite': sprite,
-                            'target_event': target_event
-                        })
+                for sprite in self.model.get_receivers(message):
+                    export_data['connections'].append({
+                        'source_sprite': source_sprite,
+                        'source_event': source_event,
+                        'message': message,
+                        'target_sprite': sprite,
+                        'target_event': target_event
+                    })
         
         # Write to file
         with open(output_path, 'w') as f:
@@ -417,7 +387,7 @@ class CodeOramaExporter:
             for j, block in enumerate(script[:3]):  # Show only first 3 blocks
                 if j > 0:
                     text += "\n"
-                text += block['opcode'].split('_')[-1]
+                text += block.opcode.split('_')[-1]
             
             # If there are more blocks, add an indicator
             if len(script) > 3:
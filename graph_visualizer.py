@@ -1,8 +1,11 @@
 import networkx as nx
-import matplotlib.pyplot as plt
+import matplotlib
 from matplotlib.patches import FancyBboxPatch
 import numpy as np
 
+from model import ProjectModel, message_name
+from visualizer import prepare_figure
+
 class GraphVisualizer:
     def __init__(self):
         self.fig = None
@@ -18,13 +21,20 @@ class GraphVisualizer:
             'default': '#A0A0A0',  # gray
         }
     
-    def visualize(self, codeorama_data, layout_type='spring', show_message_names=True):
-        """Create a force-directed graph visualization of the CodeOrama data"""
+    def visualize(self, codeorama_data, layout_type='spring', show_message_names=True, figure=None):
+        """Create a force-directed graph visualization of the CodeOrama data
+        
+        Args:
+            figure: Figure to draw into, cleared first; a new one is created if None
+        """
+        model = ProjectModel.from_data(codeorama_data)
+        
         # Create a directed graph
         G = nx.DiGraph()
         
         # Add sprites as larger nodes
         sprite_colors = {}
+        tab10 = matplotlib.colormaps['tab10']
         for i, sprite in enumerate(codeorama_data['sprites']):
             sprite_id = f"sprite_{sprite}"
             G.add_node(sprite_id, 
@@ -32,7 +42,7 @@ class GraphVisualizer:
                       label=sprite, 
                       size=1500,
                       color='#4C97FF')
-            sprite_colors[sprite] = plt.cm.tab10(i % 10)
+            sprite_colors[sprite] = tab10(i % 10)
         
         # Add scripts as nodes
         script_positions = {}
@@ -54,7 +64,7 @@ class GraphVisualizer:
                 
                 # Get script label (first block opcode)
                 first_block = script[0]
-                label = first_block.get('opcode', 'Unknown').split('_')[-1]
+                label = first_block.opcode.split('_')[-1]
                 
                 # Add the script node
                 G.add_node(script_id, 
@@ -77,22 +87,21 @@ class GraphVisualizer:
                     source_id = f"script_{source_sprite}_{source_event}_{i}"
                     
                     # For each sprite that has a script receiving this message
-                    for target_sprite in codeorama_data['sprites']:
-                        if (target_sprite, target_event) in codeorama_data['scripts']:
-                            for j, target_script in enumerate(codeorama_data['scripts'][(target_sprite, target_event)]):
-                                target_id = f"script_{target_sprite}_{target_event}_{j}"
-                                
-                                # Get message name
-                                message = target_event.replace('receive_', '')
-                                
-                                # Add edge from source to target
-                                G.add_edge(source_id, target_id, 
-                                          type='message', 
-                                          message=message,
-                                          weight=2.0)
+                    for target_sprite in model.get_event_sprites(target_event):
+                        for j, target_script in enumerate(codeorama_data['scripts'][(target_sprite, target_event)]):
+                            target_id = f"script_{target_sprite}_{target_event}_{j}"
+                            
+                            # Get message name
+                            message = message_name(target_event) or target_event
+                            
+                            # Add edge from source to target
+                            G.add_edge(source_id, target_id, 
+                                      type='message', 
+                                      message=message,
+                                      weight=2.0)
         
         # Create figure
-        plt.figure(figsize=(14, 10))
+        self.fig, self.ax = prepare_figure(figure, (14, 10))
         
         # Choose layout algorithm
         if layout_type == 'spring':
@@ -107,7 +116,7 @@ class GraphVisualizer:
         # Draw sprites (larger nodes)
         sprite_nodes = [n for n, attr in G.nodes(data=True) if attr['type'] == 'sprite']
         sprite_colors_list = [sprite_colors[G.nodes[n]['label']] for n in sprite_nodes]
-        nx.draw_networkx_nodes(G, pos, 
+        nx.draw_networkx_nodes(G, pos, ax=self.ax,
                               nodelist=sprite_nodes,
                               node_size=[G.nodes[n]['size'] for n in sprite_nodes],
                               node_color=sprite_colors_list,
@@ -116,7 +125,7 @@ class GraphVisualizer:
         # Draw scripts (smaller nodes)
         script_nodes = [n for n, attr in G.nodes(data=True) if attr['type'] == 'script']
         script_colors = [G.nodes[n]['color'] for n in script_nodes]
-        nx.draw_networkx_nodes(G, pos, 
+        nx.draw_networkx_nodes(G, pos, ax=self.ax,
                               nodelist=script_nodes,
                               node_size=[G.nodes[n]['size'] for n in script_nodes],
                               node_color=script_colors,
@@ -124,7 +133,7 @@ class GraphVisualizer:
         
         # Draw contains edges (sprite to script)
         contains_edges = [(u, v) for u, v, attr in G.edges(data=True) if attr['type'] == 'contains']
-        nx.draw_networkx_edges(G, pos, 
+        nx.draw_networkx_edges(G, pos, ax=self.ax,
                               edgelist=contains_edges,
                               width=1, alpha=0.5, 
                               edge_color='gray',
@@ -132,7 +141,7 @@ class GraphVisualizer:
         
         # Draw message edges
         message_edges = [(u, v) for u, v, attr in G.edges(data=True) if attr['type'] == 'message']
-        nx.draw_networkx_edges(G, pos, 
+        nx.draw_networkx_edges(G, pos, ax=self.ax,
                               edgelist=message_edges,
                               width=2, alpha=0.8, 
                               edge_color='red',
@@ -141,13 +150,13 @@ class GraphVisualizer:
         
         # Add labels
         sprite_labels = {n: G.nodes[n]['label'] for n in sprite_nodes}
-        nx.draw_networkx_labels(G, pos, 
+        nx.draw_networkx_labels(G, pos, ax=self.ax,
                                labels=sprite_labels,
                                font_size=10, 
                                font_weight='bold')
         
         script_labels = {n: G.nodes[n]['label'] for n in script_nodes}
-        nx.draw_networkx_labels(G, pos, 
+        nx.draw_networkx_labels(G, pos, ax=self.ax,
                                labels=script_labels,
                                font_size=8)
         
@@ -156,13 +165,13 @@ class GraphVisualizer:
             edge_labels = {(u, v): G.edges[u, v]['message'] 
                           for u, v, attr in G.edges(data=True) 
                           if attr['type'] == 'message'}
-            nx.draw_networkx_edge_labels(G, pos, 
+            nx.draw_networkx_edge_labels(G, pos, ax=self.ax,
                                         edge_labels=edge_labels,
                                         font_size=8,
                                         font_color='black',
                                         bbox=dict(facecolor='white', alpha=0.7, edgecolor='none'))
         
-        plt.axis('off')
-        plt.tight_layout()
+        self.ax.axis('off')
+        self.fig.tight_layout()
         
-        return plt.gcf()
\ No newline at end of file
+        return self.fig
\ No newline at end of file
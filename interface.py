@@ -2,27 +2,38 @@ import sys
 import os
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QPushButton, QFileDialog, QLabel,
-                            QComboBox, QCheckBox, QTabWidget, QTextEdit,
+                            QComboBox, QCheckBox, QTabWidget,
                             QSplitter, QAction, QToolBar, QColorDialog, QDialog,
                             QDialogButtonBox, QFormLayout, QLineEdit, QGroupBox,
                             QMessageBox)
-from PyQt5.QtCore import Qt, QSettings
+from PyQt5.QtCore import Qt, QSettings, QTimer
 from PyQt5.QtGui import QIcon
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+from matplotlib.figure import Figure
 
 from parser import ScratchParser
+from cache import ParseCache
 from visualizer import CodeOramaVisualizer
-from text_reports import TextReportGenerator
+from text_reports import ReportCache, TextReportGenerator
+from report_viewer import ReportViewer
 from config_dialogs import OrderConfigDialog, StyleConfigDialog
 import json
 from export import CodeOramaExporter
 from graph_visualizer import GraphVisualizer
 from tree_visualizer import TreeVisualizer
+from watcher import ProjectWatcher
+
+# Report type combo box entries mapped to TextReportGenerator report names
+REPORT_NAMES = {
+    'Broadcast Report': 'broadcast',
+    'Receive Report': 'receive',
+    'Script Layout': 'script_layout',
+}
 
 class MatplotlibCanvas(FigureCanvas):
-    def __init__(self, fig):
-        self.fig = fig
+    def __init__(self, fig=None):
+        self.fig = fig if fig is not None else Figure()
         super(MatplotlibCanvas, self).__init__(self.fig)
 
 class ECodeOramaApp(QMainWindow):
@@ -32,9 +43,25 @@ class ECodeOramaApp(QMainWindow):
         self.setGeometry(100, 100, 1200, 800)
         
         # Initialize components
-        self.parser = ScratchParser()
+        # Block fingerprints let the watcher re-parse only edited sprites
+        self.parser = ScratchParser(cache=ParseCache(), hash_targets=True)
         self.visualizer = CodeOramaVisualizer()
+        self.graph_visualizer = GraphVisualizer()
+        self.tree_visualizer = TreeVisualizer()
         self.codeorama_data = None
+        self.current_file = None
+        self.watcher = None  # Loads the open file; polled while watch mode is on
+        self.grid_shown = False  # Whether the canvas shows the grid visualizer's figure
+        # Created with the first visualization; every view redraws its figure
+        self.canvas = None
+        self.toolbar = None
+        # Generated reports, reused while the project and its ordering are unchanged
+        self.report_cache = ReportCache()
+        
+        # Polls the open file for changes while watch mode is on
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setInterval(1000)
+        self.watch_timer.timeout.connect(self.check_for_changes)
         self.settings = QSettings("eCodeOrama", "Prototype")
         
         # Setup UI
@@ -65,6 +92,11 @@ class ECodeOramaApp(QMainWindow):
         export_action.triggered.connect(self.export_visualization)
         file_menu.addAction(export_action)
         
+        self.watch_action = QAction('Watch File for Changes', self)
+        self.watch_action.setCheckable(True)
+        self.watch_action.toggled.connect(self.toggle_watch)
+        file_menu.addAction(self.watch_action)
+        
         # View menu
         view_menu = menubar.addMenu('View')
         
@@ -91,6 +123,12 @@ class ECodeOramaApp(QMainWindow):
         edit_colors_action.triggered.connect(self.edit_colors)
         tools_menu.addAction(edit_colors_action)
         
+        self.precompute_reports_action = QAction('Precompute Reports After Loading', self)
+        self.precompute_reports_action.setCheckable(True)
+        self.precompute_reports_action.toggled.connect(
+            lambda checked: self.settings.setValue("precompute_reports", checked))
+        tools_menu.addAction(self.precompute_reports_action)
+        
         # Create toolbar
         toolbar = QToolBar("Main Toolbar")
         self.addToolBar(toolbar)
@@ -126,15 +164,26 @@ class ECodeOramaApp(QMainWindow):
         self.edge_style_combo = QComboBox()
         self.edge_style_combo.addItems(['straight', 'curved', 'improved'])
         self.edge_style_combo.setCurrentText('improved')
-        self.edge_style_combo.currentTextChanged.connect(self.update_visualization)
+        self.edge_style_combo.currentTextChanged.connect(self.update_edges)
         control_layout.addWidget(QLabel("Edge Style:"))
         control_layout.addWidget(self.edge_style_combo)
         
         self.show_messages_check = QCheckBox("Show Message Names")
         self.show_messages_check.setChecked(True)
-        self.show_messages_check.stateChanged.connect(self.update_visualization)
+        self.show_messages_check.stateChanged.connect(self.update_edges)
         control_layout.addWidget(self.show_messages_check)
         
+        # Large grids draw only what the current zoom needs
+        self.level_of_detail_check = QCheckBox("Level of Detail")
+        self.level_of_detail_check.setToolTip(
+            "On large grids, show folded cells and aggregated edges when zoomed out "
+            "and full scripts only for the cells in view")
+        self.level_of_detail_check.setChecked(True)
+        self.level_of_detail_check.toggled.connect(
+            lambda checked: self.settings.setValue("level_of_detail", checked))
+        self.level_of_detail_check.stateChanged.connect(self.update_visualization)
+        control_layout.addWidget(self.level_of_detail_check)
+        
         # Add view style selection
         self.view_style_combo = QComboBox()
         self.view_style_combo.addItems(['Grid', 'Graph', 'Tree'])
@@ -196,15 +245,17 @@ class ECodeOramaApp(QMainWindow):
         self.generate_report_button.clicked.connect(self.generate_report)
         report_control_layout.addWidget(self.generate_report_button)
         
+        self.save_report_button = QPushButton("Save Report...")
+        self.save_report_button.clicked.connect(self.save_report)
+        report_control_layout.addWidget(self.save_report_button)
+        
         report_control_layout.addStretch(1)
         
         reports_layout.addLayout(report_control_layout)
         
-        # Add text area for reports
-        self.report_text = QTextEdit()
-        self.report_text.setReadOnly(True)
-        self.report_text.setFont(QApplication.font("Monospace"))
-        reports_layout.addWidget(self.report_text)
+        # Add paged viewer for reports; only the visible lines are laid out
+        self.report_viewer = ReportViewer()
+        reports_layout.addWidget(self.report_viewer)
         
         self.tab_widget.addTab(self.reports_widget, "Text Reports")
     
@@ -217,10 +268,16 @@ class ECodeOramaApp(QMainWindow):
         if file_path:
             self.status_label.setText(f"Loading: {os.path.basename(file_path)}")
             
-            # Parse the file
-            if self.parser.parse_sb3(file_path):
-                # Get CodeOrama data
-                self.codeorama_data = self.parser.get_codeorama_data()
+            # Parse the file into a fresh model, replacing any previous one.
+            # The watcher does the parse, so watch mode can later re-parse
+            # just the edited sprites without loading the file again
+            watcher = ProjectWatcher(file_path, parser=self.parser)
+            if watcher.load():
+                self.watcher = watcher
+                self.codeorama_data = watcher.model
+                self.current_file = file_path
+                self._precompute_reports()
+                self.toggle_watch(self.watch_action.isChecked())
                 
                 # Update visualization
                 self.update_visualization()
@@ -234,18 +291,63 @@ class ECodeOramaApp(QMainWindow):
             else:
                 self.status_label.setText(f"Error loading {os.path.basename(file_path)}")
     
+    def toggle_watch(self, enabled):
+        """Start or stop watching the open file for changes
+        
+        Edits saved while watching was off are picked up by the first poll.
+        """
+        if enabled and self.watcher:
+            self.watch_timer.start()
+        else:
+            self.watch_timer.stop()
+    
+    def check_for_changes(self):
+        """Re-parse the watched file if it was saved since the last check"""
+        if not self.watcher:
+            return
+        changes = self.watcher.poll()
+        if not changes:
+            return
+        
+        self.codeorama_data = self.watcher.model
+        self._precompute_reports()
+        # A grid keeps its zoom and redraws only the changed sprite columns;
+        # new rows or columns, and the graph and tree layouts, need a full redraw
+        if not (self.grid_shown and self.visualizer.update_columns(self.codeorama_data, changes)):
+            self.update_visualization()
+        
+        changed = changes.changed_sprites + changes.added_sprites
+        self.status_label.setText(
+            f"Reloaded: {os.path.basename(self.current_file)} - "
+            f"changed: {', '.join(changed) if changed else 'layout'}"
+        )
+    
+    def _precompute_reports(self):
+        """Start generating the text reports in the background if enabled"""
+        if self.codeorama_data and self.precompute_reports_action.isChecked():
+            self.report_cache.precompute(self.codeorama_data)
+    
     def update_visualization(self):
         """Update the visualization with current settings"""
         if not self.codeorama_data:
             return
             
-        # Clear previous visualization
-        for i in reversed(range(self.canvas_container.count())): 
-            self.canvas_container.itemAt(i).widget().setParent(None)
+        if self.canvas is None:
+            # Replace the placeholder with the canvas, kept for all later updates
+            for i in reversed(range(self.canvas_container.count())): 
+                self.canvas_container.itemAt(i).widget().setParent(None)
+            self.canvas = MatplotlibCanvas()
+            self.toolbar = NavigationToolbar(self.canvas, self)
+            self.canvas_container.addWidget(self.toolbar)
+            self.canvas_container.addWidget(self.canvas)
+        # Views draw into the canvas's figure instead of allocating a new one
+        figure = self.canvas.figure
         
         # Get current settings
         edge_style = self.edge_style_combo.currentText()
         show_messages = self.show_messages_check.isChecked()
+        # None lets the grid visualizer decide based on the grid size
+        level_of_detail = None if self.level_of_detail_check.isChecked() else False
         view_style = self.view_style_combo.currentText()
         
         # Get layout configuration
@@ -257,71 +359,111 @@ class ECodeOramaApp(QMainWindow):
         # Create appropriate visualization based on view style
         if view_style == 'Grid':
             # Use the original grid visualizer
-            fig = self.visualizer.visualize(
+            self.visualizer.visualize(
                 self.codeorama_data, 
                 edge_style=edge_style,
                 show_message_names=show_messages,
                 config=layout_config,
-                script_folding=script_folding
+                script_folding=script_folding,
+                level_of_detail=level_of_detail,
+                figure=figure
             )
         elif view_style == 'Graph':
             # Use the graph visualizer
             graph_layout = self.graph_layout_combo.currentText()
-            graph_viz = GraphVisualizer()
-            fig = graph_viz.visualize(
+            self.graph_visualizer.visualize(
                 self.codeorama_data,
                 layout_type=graph_layout,
-                show_message_names=show_messages
+                show_message_names=show_messages,
+                figure=figure
             )
         elif view_style == 'Tree':
             # Use the tree visualizer
             tree_root = self.tree_root_combo.currentText()
-            tree_viz = TreeVisualizer()
-            fig = tree_viz.visualize(
+            self.tree_visualizer.visualize(
                 self.codeorama_data,
                 root_event=tree_root,
-                show_message_names=show_messages
+                show_message_names=show_messages,
+                figure=figure
             )
         else:
             # Fallback to grid visualizer
-            fig = self.visualizer.visualize(
+            self.visualizer.visualize(
                 self.codeorama_data, 
                 edge_style=edge_style,
-                show_message_names=show_messages
+                show_message_names=show_messages,
+                figure=figure
             )
         
-        # Display the visualization
-        canvas = MatplotlibCanvas(fig)
+        self.grid_shown = view_style not in ('Graph', 'Tree')
         
-        # Add navigation toolbar
-        toolbar = NavigationToolbar(canvas, self)
-        self.canvas_container.addWidget(toolbar)
-        self.canvas_container.addWidget(canvas)
+        # Forget the previous view's zoom history and show the new drawing
+        self.toolbar.update()
+        self.canvas.draw_idle()
+    
+    def update_edges(self):
+        """Apply the edge options, redrawing only the edge layer of a shown grid"""
+        if not self.codeorama_data:
+            return
+        if not self.grid_shown:
+            self.update_visualization()
+            return
+        self.visualizer.update_edges(
+            edge_style=self.edge_style_combo.currentText(),
+            show_message_names=self.show_messages_check.isChecked()
+        )
     
     def generate_report(self):
         """Generate the selected text report"""
         if not self.codeorama_data:
-            self.report_text.setText("No Scratch file loaded.")
+            self.report_viewer.show_message("No Scratch file loaded.")
             return
             
-        # Create report generator
-        report_generator = TextReportGenerator(self.codeorama_data)
-        
         # Get selected report type
-        report_type = self.report_type_combo.currentText()
-        
-        # Generate the appropriate report
-        if report_type == 'Broadcast Report':
-            report = report_generator.generate_broadcast_report()
-        elif report_type == 'Receive Report':
-            report = report_generator.generate_receive_report()
-        elif report_type == 'Script Layout':
-            report = report_generator.generate_script_layout()
-        else:
-            report = "Unknown report type selected."
+        report_type = REPORT_NAMES.get(self.report_type_combo.currentText())
+        if report_type is None:
+            self.report_viewer.show_message("Unknown report type selected.")
+            return
+        
+        # Stream the report into the viewer, which pulls lines as the user
+        # scrolls; a report already generated for this project and ordering
+        # is reused
+        headers = TextReportGenerator(self.codeorama_data).section_headers(report_type)
+        self.report_viewer.show_report(self.report_cache.iter_report(self.codeorama_data, report_type), headers)
+    
+    def save_report(self):
+        """Stream the selected text report straight to a file"""
+        if not self.codeorama_data:
+            self.report_viewer.show_message("No Scratch file loaded.")
+            return
+        
+        report_type = REPORT_NAMES.get(self.report_type_combo.currentText())
+        if report_type is None:
+            return
+        
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Save Report", f"{report_type}_report.txt",
+            "Text Files (*.txt);;JSON Lines (*.jsonl)"
+        )
+        if not file_path:
+            return
         
-        # Display the report
-        self.report_text.setText(report)
+        try:
+            if selected_filter.startswith("JSON Lines") or file_path.lower().endswith('.jsonl'):
+                # Machine-readable records instead of formatted text
+                with open(file_path, 'wb') as f:
+                    TextReportGenerator(self.codeorama_data).write_records(report_type, f)
+                self.status_label.setText(f"Report saved to {os.path.basename(file_path)}")
+                return
+            with open(file_path, 'w', encoding='utf-8') as f:
+                report = self.report_cache.peek(self.codeorama_data, report_type)
+                if report is not None:
+                    f.write(report)
+                else:
+                    TextReportGenerator(self.codeorama_data).write_report(report_type, f)
+            self.status_label.setText(f"Report saved to {os.path.basename(file_path)}")
+        except Exception as e:
+            QMessageBox.warning(self, "Save Report", f"Failed to save report: {e}")
     
     def fold_all_scripts(self):
         """Fold all script blocks to minimal view"""
@@ -331,8 +473,8 @@ class ECodeOramaApp(QMainWindow):
         # Create a folding state dict with all scripts folded
         folding_state = {}
         for sprite, event in self.codeorama_data['scripts'].keys():
-            scripts = self.codeorama_data['scripts'][(sprite, event)]
-            for i in range(len(scripts)):
+            # Only counts are needed, so scripts are not unpacked here
+            for i in range(self.codeorama_data.script_count(sprite, event)):
                 folding_state[(sprite, event, i)] = True
         
         # Save folding state
@@ -497,8 +639,8 @@ class ECodeOramaApp(QMainWindow):
                 try:
                     if selected_format == "Image (Current Visualization)":
                         # Export current visualization
-                        if hasattr(self.visualizer, 'fig'):
-                            self.visualizer.fig.savefig(file_path, bbox_inches='tight')
+                        if self.canvas is not None:
+                            self.canvas.figure.savefig(file_path, bbox_inches='tight')
                             success = True
                         else:
                             raise Exception("No visualization figure available")
@@ -585,6 +727,10 @@ class ECodeOramaApp(QMainWindow):
         
         self.edge_style_combo.setCurrentText(edge_style)
         self.show_messages_check.setChecked(show_messages)
+        self.level_of_detail_check.setChecked(
+            self.settings.value("level_of_detail", True, type=bool))
+        self.precompute_reports_action.setChecked(
+            self.settings.value("precompute_reports", False, type=bool))
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
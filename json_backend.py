@@ -0,0 +1,87 @@
+import gc
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+# Preferred order when no backend is requested explicitly
+BACKEND_ORDER = ('orjson', 'simdjson', 'json')
+
+
+def _loads_stdlib(data):
+    # json.loads takes str, bytes and bytearray but not other buffers
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def _loads_orjson(data):
+    return orjson.loads(data)
+
+
+def _loads_simdjson(data):
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return simdjson.loads(data)
+
+
+BACKENDS = {
+    'orjson': (lambda: orjson is not None, _loads_orjson),
+    'simdjson': (lambda: simdjson is not None, _loads_simdjson),
+    'json': (lambda: True, _loads_stdlib),
+}
+
+
+def dumps_json(obj):
+    """Serialize obj to compact JSON bytes with the fastest installed encoder"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def available_backends():
+    """Names of the JSON backends that can be used in this environment"""
+    return [name for name in BACKEND_ORDER if BACKENDS[name][0]()]
+
+
+def get_json_loader(name=None):
+    """Return a loads(bytes) function for the named (or fastest available) backend
+
+    Fast backends are stricter than the stdlib about a few edge cases (e.g.
+    integers beyond 64 bits), so their loaders retry with json.loads before
+    reporting a decode error. The cyclic garbage collector is paused while
+    decoding: it would otherwise rescan the freshly built containers over
+    and over, which costs more than the decoding itself on large projects.
+    """
+    if name is None:
+        name = available_backends()[0]
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend: {name}")
+
+    is_available, loads = BACKENDS[name]
+    if not is_available():
+        raise ValueError(f"JSON backend '{name}' is not installed")
+
+    def loads_project(data):
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            try:
+                return loads(data)
+            except ValueError:
+                if name == 'json':
+                    raise
+                return _loads_stdlib(data)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    loads_project.backend = name
+    return loads_project
@@ -0,0 +1,140 @@
+import io
+import json
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+class JSONStreamReader:
+    """Incrementally decode the items of one top-level array in a JSON object
+
+    Only the text of the item currently being decoded is buffered, so peak
+    memory stays proportional to the largest item rather than the whole
+    document. Values of other top-level keys are decoded and dropped.
+    """
+
+    def __init__(self, stream, chunk_size=64 * 1024):
+        self._stream = stream
+        self._decoder = json.JSONDecoder()
+        self._chunk_size = chunk_size
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def iter_items(self, key):
+        """Yield each item of the top-level array stored under key"""
+        self._expect('{')
+        if self._peek() == '}':
+            return
+
+        while True:
+            name = self._decode_value()
+            self._expect(':')
+            if name == key:
+                yield from self._iter_array()
+            else:
+                # Decode and discard values we are not interested in
+                self._decode_value()
+                self._compact()
+
+            if self._separator('}'):
+                return
+
+    def _iter_array(self):
+        """Yield the items of the array starting at the current position"""
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+
+        while True:
+            yield self._decode_value()
+            self._compact()
+
+            if self._separator(']'):
+                return
+
+    def _decode_value(self, read_size=None):
+        """Decode the next JSON value, reading more input until it is complete"""
+        read_size = read_size or self._chunk_size
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill(read_size):
+                    raise
+                # Grow reads geometrically so huge values stay linear overall
+                read_size *= 2
+                continue
+
+            # A number ending exactly at the buffer end may be truncated
+            if end == len(self._buffer) and not self._eof and isinstance(value, (int, float)):
+                self._fill(read_size)
+                continue
+
+            self._pos = end
+            return value
+
+    def _fill(self, size):
+        """Append more text to the buffer; return False at end of input"""
+        if self._eof:
+            return False
+        chunk = self._stream.read(size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer += chunk
+        return True
+
+    def _compact(self):
+        """Drop already decoded text from the front of the buffer"""
+        if self._pos:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+    def _peek(self):
+        """Skip whitespace and return the next character without consuming it"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            self._compact()
+            if not self._fill(self._chunk_size):
+                raise ValueError("Unexpected end of JSON input")
+
+    def _next_char(self):
+        """Consume and return the next non-whitespace character"""
+        char = self._peek()
+        self._pos += 1
+        return char
+
+    def _expect(self, char):
+        """Consume the next non-whitespace character, which must be char"""
+        found = self._next_char()
+        if found != char:
+            raise ValueError(f"Expected '{char}' in JSON input, found '{found}'")
+
+    def _separator(self, closing):
+        """Consume ',' or the closing bracket; return True at the closing bracket"""
+        found = self._next_char()
+        if found == closing:
+            return True
+        if found != ',':
+            raise ValueError(f"Expected ',' or '{closing}' in JSON input, found '{found}'")
+        return False
+
+
+def iter_json_array(binary_stream, key):
+    """Stream the items of data[key] from a binary JSON stream
+
+    Uses ijson when it is installed and falls back to the incremental
+    stdlib decoder otherwise.
+    """
+    if ijson is not None:
+        return ijson.items(binary_stream, f'{key}.item', use_float=True)
+    text_stream = io.TextIOWrapper(binary_stream, encoding='utf-8')
+    return JSONStreamReader(text_stream).iter_items(key)
@@ -0,0 +1,670 @@
+import copy
+import itertools
+import sys
+import threading
+from array import array
+from collections.abc import Mapping
+
+RECEIVE_PREFIX = 'receive_'
+BROADCAST_OPCODES = ('event_broadcast', 'event_broadcastandwait')
+
+
+class SymbolTable:
+    """Interns strings to small integer ids
+
+    Each distinct string is stored once and keeps its id for the life of
+    the table, which never forgets a string. That suits the small, closed
+    set of opcode names stored as ids in Script arrays; names taken from
+    projects go in a NameTable instead.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+        self._lock = threading.Lock()  # Parsers may share a table across threads
+
+    def intern(self, name):
+        """Return the id for a string, assigning a new one if needed"""
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            with self._lock:
+                # Another thread may have added it while we waited
+                symbol_id = self.ids.get(name)
+                if symbol_id is None:
+                    symbol_id = len(self.names)
+                    name = sys.intern(name)
+                    self.names.append(name)
+                    self.ids[name] = symbol_id
+        return symbol_id
+
+    def name(self, symbol_id):
+        return self.names[symbol_id]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+
+class NameTable:
+    """Hands out one shared copy of each sprite, event and message name
+
+    Dictionary keys built from the shared copies compare by identity, and
+    models parsed with the same table store each name once. The table holds
+    at most max_names names and starts over when it fills up, so a parser
+    reused for thousands of projects stays the same size. Names handed out
+    earlier stay valid, they just stop being shared with later parses.
+    """
+
+    def __init__(self, max_names=8192):
+        self.max_names = max_names
+        self._names = {}
+        self._lock = threading.Lock()  # Parsers may share a table across threads
+
+    def canonical(self, name):
+        """Return the shared copy of a string; other values are passed through"""
+        if not isinstance(name, str):
+            return name
+        shared = self._names.get(name)
+        if shared is None:
+            with self._lock:
+                if len(self._names) >= self.max_names:
+                    self._names.clear()
+                shared = self._names.setdefault(name, name)
+        return shared
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._names
+
+
+OPCODES = SymbolTable()  # Opcode names; ids are stored in Script arrays
+SYMBOLS = NameTable()  # Sprite, event and message names, for parsers that opt in to sharing
+
+# Serial numbers identify models whose project.json hash is not known
+_MODEL_SERIALS = itertools.count(1)
+
+
+def _opcode_array(opcode_ids):
+    """Store OPCODES ids as array('H'), widening to 'I' once ids pass 65535
+
+    OPCODES is shared by every parser and never forgets a name, so a long
+    batch run over projects with custom or garbage opcodes can outgrow two
+    bytes. The table only grows, so checking its size after the ids were
+    interned covers every id passed in.
+    """
+    if len(OPCODES) > 0x10000:
+        return array('I', opcode_ids)
+    return array('H', opcode_ids)
+
+
+def _local_typecode(count):
+    """Smallest array typecode for per-target ids below count"""
+    if count <= 0x100:
+        return 'B'
+    if count <= 0x10000:
+        return 'H'
+    return 'I'
+
+
+class Block:
+    """Lightweight view of one block: its opcode and broadcast message (if any)"""
+
+    __slots__ = ('opcode', 'message')
+
+    def __init__(self, opcode, message=None):
+        self.opcode = opcode
+        self.message = message
+
+    def __repr__(self):
+        if self.message is None:
+            return f"Block({self.opcode!r})"
+        return f"Block({self.opcode!r}, {self.message!r})"
+
+
+class Script:
+    """Compact script storage: interned opcode ids plus sparse broadcast messages
+
+    Only what the reports, exporters and visualizers read is kept. Indexing
+    or iterating yields Block views built on demand.
+    """
+
+    __slots__ = ('opcode_ids', 'messages')
+
+    def __init__(self, opcodes=(), messages=None):
+        self.opcode_ids = _opcode_array([OPCODES.intern(opcode) for opcode in opcodes])
+        self.messages = messages or None  # {block index: broadcast message}
+
+    @classmethod
+    def from_ids(cls, opcode_ids, messages=None):
+        """Build a script from an array of OPCODES ids without re-interning"""
+        script = cls.__new__(cls)
+        script.opcode_ids = opcode_ids
+        script.messages = messages or None
+        return script
+
+    @property
+    def opcodes(self):
+        """List of opcode names, in block order"""
+        names = OPCODES.names
+        return [names[opcode_id] for opcode_id in self.opcode_ids]
+
+    def _block(self, index):
+        message = self.messages.get(index) if self.messages else None
+        return Block(OPCODES.names[self.opcode_ids[index]], message)
+
+    def __len__(self):
+        return len(self.opcode_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._block(i) for i in range(*index.indices(len(self.opcode_ids)))]
+        if index < 0:
+            index += len(self.opcode_ids)
+        if not 0 <= index < len(self.opcode_ids):
+            raise IndexError("script block index out of range")
+        return self._block(index)
+
+    def __iter__(self):
+        for index in range(len(self.opcode_ids)):
+            yield self._block(index)
+
+    def __reduce__(self):
+        # Opcode ids are only meaningful within this process, so pickle names
+        return (Script, (self.opcodes, self.messages))
+
+    def __repr__(self):
+        return f"Script({self.opcodes!r})"
+
+
+def message_name(event):
+    """Return the broadcast message of a 'receive_<message>' event, or None"""
+    if event and event.startswith(RECEIVE_PREFIX):
+        return event[len(RECEIVE_PREFIX):]
+    return None
+
+
+def _pack_scripts(scripts):
+    """Pack {event: [Script]} as (opcode names, [(event, [(local ids, messages)])])
+
+    Ids index a per-target name table, so the packed form is valid in any
+    process and holds one byte per block for the usual < 256 opcodes.
+    """
+    global_ids = {}
+    packed = []
+    for event, event_scripts in scripts.items():
+        packed_scripts = []
+        for script in event_scripts:
+            local_ids = [global_ids.setdefault(opcode_id, len(global_ids)) for opcode_id in script.opcode_ids]
+            packed_scripts.append((local_ids, script.messages))
+        packed.append((event, packed_scripts))
+
+    names = tuple(OPCODES.names[opcode_id] for opcode_id in global_ids)
+    typecode = _local_typecode(len(names))
+    for _, packed_scripts in packed:
+        for i, (local_ids, messages) in enumerate(packed_scripts):
+            packed_scripts[i] = (array(typecode, local_ids).tobytes(), messages)
+    return (names, typecode, packed)
+
+
+def _unpack_scripts(packed):
+    """Rebuild {event: [Script]} from the output of _pack_scripts"""
+    names, typecode, packed_scripts = packed
+    global_ids = [OPCODES.intern(name) for name in names]
+    scripts = {}
+    for event, event_scripts in packed_scripts:
+        scripts[event] = [
+            Script.from_ids(_opcode_array(map(global_ids.__getitem__, array(typecode, local_ids))), messages)
+            for local_ids, messages in event_scripts
+        ]
+    return scripts
+
+
+def _restore_target(name, packed, connections, blocks_hash):
+    target = TargetResult(name, None, connections, blocks_hash)
+    target._scripts = None  # Unpacked on first access
+    target._packed = packed
+    return target
+
+
+class TargetResult:
+    """Parsed scripts and broadcast connections of a single target (sprite or stage)
+
+    Targets restored from a pickle (the parse cache or the worker pool)
+    keep their scripts packed until `scripts` is first read; hat events,
+    script counts and connections are available without unpacking.
+    """
+
+    __slots__ = ('name', '_scripts', '_packed', 'connections', 'blocks_hash')
+
+    def __init__(self, name, scripts=None, connections=None, blocks_hash=None):
+        self.name = name
+        self._scripts = scripts if scripts is not None else {}  # {event_name: [Script]}
+        self._packed = None  # Output of _pack_scripts while scripts are not unpacked
+        self.connections = connections if connections is not None else []
+        self.blocks_hash = blocks_hash  # Fingerprint of the target's blocks, if computed
+
+    @property
+    def scripts(self):
+        """{event_name: [Script]}, unpacked and cached on first access"""
+        scripts = self._scripts
+        if scripts is None:
+            scripts = self._scripts = _unpack_scripts(self._packed)
+        return scripts
+
+    @property
+    def is_materialized(self):
+        """True once the scripts have been unpacked"""
+        return self._scripts is not None
+
+    def events(self):
+        """Hat event names in script order, without unpacking scripts"""
+        if self._scripts is not None:
+            return list(self._scripts)
+        return [event for event, _ in self._packed[2]]
+
+    def script_count(self, event):
+        """Number of scripts under an event, without unpacking scripts"""
+        if self._scripts is not None:
+            return len(self._scripts.get(event, ()))
+        for packed_event, packed_scripts in self._packed[2]:
+            if packed_event == event:
+                return len(packed_scripts)
+        return 0
+
+    def messages(self):
+        """Set of messages this target broadcasts"""
+        return {message_name(target_event) for _, _, _, target_event in self.connections}
+
+    def intern_names(self, symbols):
+        """Replace names with their shared copies, e.g. after unpickling"""
+        canonical = symbols.canonical
+        self.name = canonical(self.name)
+        self.connections = [
+            (canonical(source_sprite), canonical(source_event), canonical(target_sprite), canonical(target_event))
+            for source_sprite, source_event, target_sprite, target_event in self.connections
+        ]
+
+        def intern_messages(messages):
+            if not messages:
+                return messages
+            return {index: canonical(message) for index, message in messages.items()}
+
+        if self._scripts is None:
+            names, typecode, packed = self._packed
+            packed = [
+                (canonical(event), [(local_ids, intern_messages(messages)) for local_ids, messages in scripts])
+                for event, scripts in packed
+            ]
+            self._packed = (names, typecode, packed)
+            return
+
+        self._scripts = {canonical(event): scripts for event, scripts in self._scripts.items()}
+        for scripts in self._scripts.values():
+            for script in scripts:
+                script.messages = intern_messages(script.messages)
+
+    def __reduce__(self):
+        packed = self._packed if self._scripts is None else _pack_scripts(self._scripts)
+        return (_restore_target, (self.name, packed, self.connections, self.blocks_hash))
+
+
+class ScriptTable(Mapping):
+    """Read-only {(sprite_name, event_name): [Script]} view over TargetResults
+
+    Keys and lengths come from hat metadata; a target's scripts are only
+    unpacked when one of its cells is looked up (unfolded, exported or
+    reported).
+    """
+
+    def __init__(self, targets):
+        self._targets = {target.name: target for target in targets}
+
+    def __getitem__(self, key):
+        sprite, event = key
+        target = self._targets.get(sprite)
+        if target is None or not target.script_count(event):
+            raise KeyError(key)
+        return target.scripts[event]
+
+    def __iter__(self):
+        for sprite, target in self._targets.items():
+            for event in target.events():
+                yield (sprite, event)
+
+    def __len__(self):
+        return sum(len(target.events()) for target in self._targets.values())
+
+    def __contains__(self, key):
+        try:
+            sprite, event = key
+        except (TypeError, ValueError):
+            return False
+        target = self._targets.get(sprite)
+        return target is not None and target.script_count(event) > 0
+
+    def script_count(self, sprite, event):
+        """Number of scripts in a cell, without unpacking them"""
+        target = self._targets.get(sprite)
+        return target.script_count(event) if target is not None else 0
+
+
+class ChangeSet:
+    """What a call to ProjectModel.replace_targets changed
+
+    CodeOramaVisualizer.update_columns uses it to redraw only the affected
+    sprite columns unless layout_changed is set, in which case rows or
+    columns moved.
+    """
+
+    def __init__(self, changed_sprites=(), added_sprites=(), removed_sprites=(),
+                 added_events=(), removed_events=(), messages=()):
+        self.changed_sprites = list(changed_sprites)
+        self.added_sprites = list(added_sprites)
+        self.removed_sprites = list(removed_sprites)
+        self.added_events = list(added_events)
+        self.removed_events = list(removed_events)
+        self.messages = set(messages)  # Messages whose broadcasters or receivers changed
+
+    @property
+    def layout_changed(self):
+        """True if sprites or events were added or removed"""
+        return bool(self.added_sprites or self.removed_sprites
+                    or self.added_events or self.removed_events)
+
+    def __bool__(self):
+        return bool(self.changed_sprites or self.layout_changed)
+
+    def __repr__(self):
+        return (f"ChangeSet(changed={self.changed_sprites!r}, added={self.added_sprites!r}, "
+                f"removed={self.removed_sprites!r}, layout_changed={self.layout_changed})")
+
+
+class ProjectModel:
+    """Parsed CodeOrama data with precomputed lookup indexes
+
+    The model still supports dictionary-style access ('sprites', 'events',
+    'scripts', 'connections') so it can be passed anywhere codeorama_data
+    is expected, but consumers should prefer the index lookups below over
+    scanning every sprite for every connection.
+
+    Models are treated as immutable once built: apply_config and
+    replace_targets return new models and may share unchanged parts.
+    """
+
+    KEYS = ('sprites', 'events', 'scripts', 'connections')
+
+    def __init__(self, sprites, events, scripts, connections, targets=None, stats=None):
+        self.sprites = list(sprites)
+        self.events = list(events)
+        # {(sprite_name, event_name): [Script]}; a lazy ScriptTable when built from targets
+        self.scripts = scripts if isinstance(scripts, ScriptTable) else dict(scripts)
+        self.connections = list(connections)  # [(source_sprite, source_event, target_sprite, target_event)]
+        self.targets = list(targets or [])  # [TargetResult] when built by the parser
+        self.version = 0  # Incremented by each replace_targets derivation
+        self.stats = stats  # ParseStats when the parser collected them
+        self.content_hash = None  # SHA-256 of project.json when the parser computed it
+        self._serial = next(_MODEL_SERIALS)
+
+        self.sprite_rank = {}  # {sprite: column index}
+        self.event_rank = {}  # {event: row index}
+        self.sprite_cells = {}  # {sprite: [event]} in event order
+        self.event_cells = {}  # {event: [sprite]} in sprite order
+        self.broadcasters = {}  # {message: [(source_sprite, source_event)]}
+        self.cell_messages = {}  # {(sprite, event): [message]} in connection order
+        self._build_indexes()
+
+    @classmethod
+    def from_data(cls, codeorama_data):
+        """Wrap a plain codeorama_data dict; models are returned unchanged"""
+        if isinstance(codeorama_data, cls):
+            return codeorama_data
+        return cls(
+            codeorama_data['sprites'],
+            codeorama_data['events'],
+            codeorama_data['scripts'],
+            codeorama_data['connections']
+        )
+
+    @classmethod
+    def from_targets(cls, targets, stats=None, content_hash=None):
+        """Build a model from per-target parse results"""
+        model = cls([], [], {}, [], targets, stats)
+        model.content_hash = content_hash
+        model._flatten_targets()
+        model._build_indexes()
+        return model
+
+    def _flatten_targets(self):
+        """Rebuild sprites, events, scripts and connections from self.targets"""
+        events = set()
+        connections = []
+        for target in self.targets:
+            events.update(target.events())
+            connections.extend(target.connections)
+        self.sprites = [target.name for target in self.targets]
+        self.events = sorted(events)
+        self.scripts = ScriptTable(self.targets)
+        self.connections = connections
+
+    def replace_targets(self, targets):
+        """Derive a model with new per-target results; returns (model, ChangeSet)
+
+        This model is left untouched. Targets that are the same objects as
+        before are treated as unchanged. When no sprite or event was added or
+        removed the new model shares this one's indexes and only the entries
+        of changed targets are rebuilt.
+        """
+        old_targets = {target.name: target for target in self.targets}
+        old_sprites = self.sprites
+        old_events = self.events
+
+        changed = [target for target in targets if old_targets.get(target.name) is not target]
+        new_names = {target.name for target in targets}
+        messages = set()
+        for target in changed:
+            messages |= target.messages()
+            if target.name in old_targets:
+                messages |= old_targets[target.name].messages()
+        for name, target in old_targets.items():
+            if name not in new_names:
+                messages |= target.messages()
+
+        # Shallow copy: index dicts are shared until _update_indexes copies them
+        model = copy.copy(self)
+        model.targets = list(targets)
+        model.stats = None
+        model.version = self.version + 1
+        # New content: the caller sets content_hash if it knows it
+        model.content_hash = None
+        model._serial = next(_MODEL_SERIALS)
+        model._flatten_targets()
+
+        old_sprite_set = set(old_sprites)
+        old_event_set = set(old_events)
+        new_event_set = set(model.events)
+        changes = ChangeSet(
+            changed_sprites=[t.name for t in changed if t.name in old_sprite_set],
+            added_sprites=[s for s in model.sprites if s not in old_sprite_set],
+            removed_sprites=[s for s in old_sprites if s not in new_names],
+            added_events=[e for e in model.events if e not in old_event_set],
+            removed_events=[e for e in old_events if e not in new_event_set],
+            messages=messages
+        )
+
+        if changes.layout_changed or model.sprites != old_sprites:
+            # Columns or rows moved, so every index needs rebuilding
+            model._build_indexes()
+        elif changed:
+            model._update_indexes(changed, old_targets, messages)
+
+        return model, changes
+
+    def _update_indexes(self, changed, old_targets, messages):
+        """Update the indexes for changed targets when the grid layout is unchanged"""
+        # The index dicts and their lists may be shared with the model this
+        # one was derived from, so copy before changing anything
+        self.sprite_cells = dict(self.sprite_cells)
+        self.event_cells = dict(self.event_cells)
+        self.cell_messages = dict(self.cell_messages)
+        self.broadcasters = dict(self.broadcasters)
+
+        missing_event = len(self.events)
+        for target in changed:
+            sprite = target.name
+            old = old_targets[sprite]
+            for event in old.events():
+                remaining = [s for s in self.event_cells[event] if s != sprite]
+                if remaining:
+                    self.event_cells[event] = remaining
+                else:
+                    del self.event_cells[event]
+                self.cell_messages.pop((sprite, event), None)
+
+            events = target.events()
+            events.sort(key=lambda e: self.event_rank.get(e, missing_event))
+            self.sprite_cells[sprite] = events
+            for event in events:
+                sprites = self.event_cells.get(event, []) + [sprite]
+                sprites.sort(key=self.sprite_rank.__getitem__)
+                self.event_cells[event] = sprites
+
+            for source_sprite, source_event, _, target_event in target.connections:
+                message = message_name(target_event)
+                if message is not None:
+                    self.cell_messages.setdefault((source_sprite, source_event), []).append(message)
+
+        # Broadcaster lists keep connection order, so recompute affected messages
+        broadcasters = {}
+        seen = set()
+        for source_sprite, source_event, _, target_event in self.connections:
+            message = message_name(target_event)
+            if message not in messages or not source_sprite or not source_event:
+                continue
+            if (message, source_sprite, source_event) not in seen:
+                seen.add((message, source_sprite, source_event))
+                broadcasters.setdefault(message, []).append((source_sprite, source_event))
+        for message in messages:
+            if message in broadcasters:
+                self.broadcasters[message] = broadcasters[message]
+            else:
+                self.broadcasters.pop(message, None)
+
+    def _build_indexes(self):
+        """Build all lookup indexes in a single pass over scripts and connections"""
+        self.sprite_rank = {sprite: i for i, sprite in enumerate(self.sprites)}
+        self.event_rank = {event: i for i, event in enumerate(self.events)}
+
+        sprite_cells = {sprite: [] for sprite in self.sprites}
+        event_cells = {}
+        for sprite, event in self.scripts:
+            if sprite not in self.sprite_rank:
+                continue
+            sprite_cells[sprite].append(event)
+            event_cells.setdefault(event, []).append(sprite)
+
+        # Keep cell lists in display order so lookups need no further sorting
+        missing_event = len(self.events)
+        for events in sprite_cells.values():
+            events.sort(key=lambda e: self.event_rank.get(e, missing_event))
+        for sprites in event_cells.values():
+            sprites.sort(key=self.sprite_rank.__getitem__)
+        self.sprite_cells = sprite_cells
+        self.event_cells = event_cells
+
+        broadcasters = {}
+        cell_messages = {}
+        seen = set()
+        for source_sprite, source_event, _, target_event in self.connections:
+            message = message_name(target_event)
+            if not source_sprite or not source_event or message is None:
+                continue
+            if (message, source_sprite, source_event) not in seen:
+                seen.add((message, source_sprite, source_event))
+                broadcasters.setdefault(message, []).append((source_sprite, source_event))
+            cell_messages.setdefault((source_sprite, source_event), []).append(message)
+        self.broadcasters = broadcasters
+        self.cell_messages = cell_messages
+
+    def get_event_sprites(self, event):
+        """Get sprites (in column order) that have scripts for an event"""
+        return self.event_cells.get(event, [])
+
+    def get_sprite_events(self, sprite):
+        """Get events (in row order) that a sprite has scripts for"""
+        return self.sprite_cells.get(sprite, [])
+
+    def get_receivers(self, message):
+        """Get sprites (in column order) that receive a message"""
+        return self.event_cells.get(RECEIVE_PREFIX + message, [])
+
+    def get_broadcasters(self, message):
+        """Get (sprite, event) cells that broadcast a message"""
+        return self.broadcasters.get(message, [])
+
+    def get_broadcasting_sprites(self, message):
+        """Get sprites that broadcast a message, in first-broadcast order"""
+        return list(dict.fromkeys(sprite for sprite, _ in self.get_broadcasters(message)))
+
+    def script_count(self, sprite, event):
+        """Number of scripts in a (sprite, event) cell, without unpacking them"""
+        if isinstance(self.scripts, ScriptTable):
+            return self.scripts.script_count(sprite, event)
+        return len(self.scripts.get((sprite, event), ()))
+
+    def get_cell_messages(self, sprite, event):
+        """Get messages broadcast by the scripts of a (sprite, event) cell"""
+        return self.cell_messages.get((sprite, event), [])
+
+    def apply_config(self, config):
+        """Return a model reordered by a layout config's sprite/event order"""
+        if not config or ('sprite_order' not in config and 'event_order' not in config):
+            return self
+
+        sprites = self.sprites
+        if 'sprite_order' in config:
+            # Use only sprites that exist in the data, then any sprites not in the order
+            sprites = [s for s in config['sprite_order'] if s in self.sprite_rank]
+            listed = set(sprites)
+            sprites.extend([s for s in self.sprites if s not in listed])
+
+        events = self.events
+        if 'event_order' in config:
+            # Use only events that exist in the data, then any events not in the order
+            events = [e for e in config['event_order'] if e in self.event_rank]
+            listed = set(events)
+            events.extend([e for e in self.events if e not in listed])
+
+        model = ProjectModel(sprites, events, self.scripts, self.connections)
+        # Same content, just reordered
+        model.content_hash = self.content_hash
+        model._serial = self._serial
+        return model
+
+    @property
+    def content_key(self):
+        """Identifies the project content: the project.json hash, or a per-model serial"""
+        if self.content_hash is not None:
+            return self.content_hash
+        return f'model-{self._serial}'
+
+    def to_dict(self):
+        """Return the plain codeorama_data dictionary"""
+        return {key: getattr(self, key) for key in self.KEYS}
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.KEYS else default
+
+    def keys(self):
+        return list(self.KEYS)
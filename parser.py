@@ -1,105 +1,623 @@
-import json
+import hashlib
+import io
+import os
+import threading
+import time
 import zipfile
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+
+from buffer_reader import BufferReader
+from json_backend import dumps_json, get_json_loader
+from json_stream import iter_json_array
+from model import BROADCAST_OPCODES, NameTable, ProjectModel, Script, TargetResult
+from stats import ParseStats
+
+# Bump whenever the parsed output changes so cached results are not reused
+PARSER_VERSION = 6
+
+# Projects with fewer blocks than this are processed in-process even when
+# the caller asks for a worker pool, since shipping targets to workers costs
+# more. The pool is off unless ScratchParser is given workers > 1, and is
+# never used on a single CPU, where it measured 0.64-0.87x of in-process
+# speed at every size (benchmarks/bench_parallel_targets.py)
+PARALLEL_MIN_BLOCKS = 20000
+
+_worker_parsers = {}  # {(json_backend, hash_targets): ScratchParser} in each pool worker
+
+
+def hash_blocks(blocks):
+    """Fingerprint a target's blocks dict to detect edits between saves"""
+    return _hash_json(dumps_json(blocks))
+
+
+def _hash_json(blocks_json):
+    return hashlib.blake2b(blocks_json, digest_size=16).hexdigest()
+
+
+def _process_target_chunk(json_backend, hash_targets, chunk):
+    """Pool worker entry point: process [(name, blocks JSON)]; returns (results, counters)"""
+    key = (json_backend, hash_targets)
+    parser = _worker_parsers.get(key)
+    if parser is None:
+        parser = _worker_parsers[key] = ScratchParser(json_backend=json_backend)
+    # Names go back pickled and are interned by the calling parser, so a
+    # table per chunk keeps this long-lived worker from collecting them all
+    parser.symbols = NameTable()
+    
+    stats = ParseStats()
+    results = []
+    for sprite_name, blocks_json in chunk:
+        if blocks_json is None:
+            results.append(parser._process_target(sprite_name, None, stats=stats))
+            continue
+        # Hash the bytes we were sent; they are exactly what hash_blocks would hash
+        blocks_hash = _hash_json(blocks_json) if hash_targets else None
+        blocks = parser._json_loads(blocks_json)
+        results.append(parser._process_target(sprite_name, blocks, blocks_hash, stats))
+    return results, stats.counters()
+
+
+def _is_buffer(source):
+    """True for in-memory bytes rather than a path or file object"""
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+def _describe_source(source):
+    """Label for a path, buffer or stream, used in parse stats"""
+    if isinstance(source, (str, os.PathLike)):
+        return str(source)
+    if _is_buffer(source):
+        return f"<{len(memoryview(source).cast('B'))} bytes>"
+    return str(getattr(source, 'name', '<stream>'))
+
+
+def _open_zip(source):
+    """Open an .sb3 from a path, a binary file object or in-memory bytes"""
+    if hasattr(source, 'seekable') and not source.seekable():
+        # zipfile seeks to the central directory at the end, so a socket or
+        # pipe stream is read once into memory first
+        data = bytearray()
+        for chunk in iter(lambda: source.read(1024 * 1024), b''):
+            data += chunk
+        source = data
+    if _is_buffer(source):
+        # Read the archive in place instead of copying it into a BytesIO
+        source = BufferReader(source)
+    return zipfile.ZipFile(source, 'r')
+
+
+def _phase(stats, name):
+    """Time a block of work under a stats phase (no-op when stats are off)"""
+    if stats is None:
+        return nullcontext()
+    return stats.phase(name)
+
+class BlockWalker:
+    """Walks all scripts of one target in a single linear pass
+    
+    Hat blocks and custom block definitions are indexed once, then every
+    stack is walked iteratively (no recursion) following `next` chains and
+    nested SUBSTACK inputs. Calls to custom blocks pick up the broadcasts
+    of their definition, which is walked only once and memoized.
+    """
+    
+    def __init__(self, parser, blocks, stats=None):
+        self.parser = parser
+        self.blocks = blocks
+        self.stats = stats  # Optional ParseStats
+        self.hats = []  # [(hat_block_id, event_name)]
+        self.definitions = {}  # {proccode: definition block id}
+        self._visited = set()
+        self._procedure_bodies = {}  # {proccode: ([direct messages], [called proccodes])}
+        self._procedure_messages = {}  # {proccode: [messages including nested calls]}
+        self._index_blocks()
+    
+    def _index_blocks(self):
+        """Find script entry points and custom block definitions"""
+        for block_id, block in self.blocks.items():
+            # Top-level variable and list reporters are stored as arrays
+            if not isinstance(block, dict):
+                continue
+            
+            opcode = block.get('opcode', '')
+            if block.get('topLevel') and opcode.startswith('event_'):
+                event_name = self.parser._get_event_name(block)
+                if event_name:
+                    self.hats.append((block_id, event_name))
+            elif opcode == 'procedures_definition':
+                proccode = self._get_definition_proccode(block)
+                if proccode is not None:
+                    self.definitions[proccode] = block_id
+    
+    def walk_script(self, hat_id):
+        """Walk one script; return (opcodes, {block index: message}, [broadcast messages])"""
+        opcodes = []
+        messages = {}
+        broadcasts = []
+        for block in self._iter_stack(hat_id):
+            opcode = block.get('opcode', '')
+            opcodes.append(opcode)
+            
+            # Check for broadcast blocks
+            if opcode in BROADCAST_OPCODES:
+                message = self._resolve_broadcast(block)
+                if message:
+                    messages[len(opcodes) - 1] = message
+                    broadcasts.append(message)
+            elif opcode == 'procedures_call':
+                broadcasts.extend(self.procedure_messages(self._get_call_proccode(block)))
+        
+        return opcodes, messages, broadcasts
+    
+    def procedure_messages(self, proccode):
+        """Messages broadcast by a custom block, including custom blocks it calls"""
+        if proccode in self._procedure_messages:
+            return self._procedure_messages[proccode]
+        
+        # Breadth-first over the call graph; recursive calls are visited once
+        messages = []
+        queue = [proccode]
+        seen = {proccode}
+        for code in queue:
+            direct, calls = self._procedure_body(code)
+            messages.extend(direct)
+            for callee in calls:
+                if callee not in seen:
+                    seen.add(callee)
+                    queue.append(callee)
+        
+        self._procedure_messages[proccode] = messages
+        return messages
+    
+    def _procedure_body(self, proccode):
+        """Walk a custom block definition once; return its broadcasts and calls"""
+        if proccode in self._procedure_bodies:
+            return self._procedure_bodies[proccode]
+        
+        messages = []
+        calls = []
+        definition_id = self.definitions.get(proccode)
+        if definition_id is not None:
+            for block in self._iter_stack(definition_id):
+                opcode = block.get('opcode', '')
+                if opcode in BROADCAST_OPCODES:
+                    message = self._resolve_broadcast(block)
+                    if message:
+                        messages.append(message)
+                elif opcode == 'procedures_call':
+                    calls.append(self._get_call_proccode(block))
+        
+        self._procedure_bodies[proccode] = (messages, calls)
+        return messages, calls
+    
+    def _resolve_broadcast(self, block):
+        """Get the interned message of a broadcast block, recording stats when enabled"""
+        if self.stats is None:
+            return self.parser.symbols.canonical(self.parser._get_broadcast_message(block, self.blocks))
+        
+        start = time.perf_counter()
+        message = self.parser.symbols.canonical(self.parser._get_broadcast_message(block, self.blocks))
+        self.stats.add_time('broadcasts', time.perf_counter() - start)
+        if not message:
+            self.stats.unresolved_broadcasts += 1
+        return message
+    
+    def _iter_stack(self, start_id):
+        """Yield the blocks of a stack in execution order, descending into substacks"""
+        stack = [start_id]
+        while stack:
+            block_id = stack.pop()
+            block = self.blocks.get(block_id)
+            if block_id in self._visited or not isinstance(block, dict):
+                continue
+            # Every block is visited at most once per target, which keeps the
+            # walk linear and guards against cycles in malformed projects
+            self._visited.add(block_id)
+            yield block
+            
+            # Push the continuation first so nested substacks come out before it
+            if block.get('next'):
+                stack.append(block['next'])
+            stack.extend(reversed(self._get_substacks(block)))
+    
+    def _get_substacks(self, block):
+        """Get the first block ids of the C-block substacks (SUBSTACK, SUBSTACK2, ...)"""
+        substacks = []
+        for name, value in sorted(block.get('inputs', {}).items()):
+            if name.startswith('SUBSTACK') and isinstance(value, list) and len(value) > 1 \
+                    and isinstance(value[1], str):
+                substacks.append(value[1])
+        return substacks
+    
+    def _get_definition_proccode(self, block):
+        """Get the proccode of a procedures_definition via its prototype block"""
+        custom_block = block.get('inputs', {}).get('custom_block')
+        if isinstance(custom_block, list) and len(custom_block) > 1:
+            prototype = self.blocks.get(custom_block[1])
+            if isinstance(prototype, dict):
+                return prototype.get('mutation', {}).get('proccode')
+        return None
+    
+    def _get_call_proccode(self, block):
+        """Get the proccode of a procedures_call block"""
+        return block.get('mutation', {}).get('proccode')
 
 class ScratchParser:
-    def __init__(self):
-        self.sprites = []
-        self.events = set()
-        self.scripts = defaultdict(list)  # {(sprite_name, event_name): [scripts]}
-        self.connections = []  # [(source_sprite, source_script, target_sprite, target_event)]
-        
-    def parse_sb3(self, file_path):
-        """Parse a Scratch .sb3 file and extract sprites, events, scripts and connections"""
+    """Parses .sb3 files into independent ProjectModel results
+    
+    The parser keeps only its configuration and its table of interned
+    names, so one instance can be reused for any number of files and
+    shared between threads. Every call to parse_sb3 builds and returns a
+    new model.
+    """
+    
+    def __init__(self, streaming=False, cache=None, json_backend=None, hash_targets=False,
+                 collect_stats=False, symbols=None, workers=None, parallel_min_blocks=PARALLEL_MIN_BLOCKS):
+        # In streaming mode targets are decoded one at a time and everything
+        # except their names and blocks is discarded straight away
+        self.streaming = streaming
+        self.cache = cache  # Optional ParseCache keyed by project.json content
+        # Fastest installed decoder (orjson, simdjson) unless one is named
+        self.json_backend = json_backend
+        self._json_loads = get_json_loader(json_backend)
+        # Fingerprint each target's blocks so reparse_sb3 can skip unchanged ones
+        self.hash_targets = hash_targets
+        # Attach phase timings and counters to each returned model as model.stats
+        self.collect_stats = collect_stats
+        # Sprite, event and message names are shared through a bounded
+        # NameTable of this parser's own; pass one (such as model.SYMBOLS)
+        # to share it between parsers instead
+        self.symbols = symbols if symbols is not None else NameTable()
+        # Process targets of big projects across this many worker processes
+        # (None or 1, the default, keeps everything in-process, as does a
+        # single-CPU machine). Streaming parses and projects under
+        # parallel_min_blocks blocks always stay in-process
+        self.workers = workers if (os.cpu_count() or 1) > 1 else None
+        self.parallel_min_blocks = parallel_min_blocks
+        self._pool = None  # Created on first use
+        self._pool_lock = threading.Lock()
+        
+    def close(self):
+        """Shut down the worker pool, if one was started"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+        
+    def parse_sb3(self, source, raise_errors=False):
+        """Parse a Scratch .sb3 into a ProjectModel; returns None on failure
+        
+        Args:
+            source: Path of the .sb3, its contents as bytes, bytearray or
+                memoryview (read in place, without a temp file), or a
+                binary file object; non-seekable streams such as sockets
+                are read into memory first
+            raise_errors: Raise the error that stopped the parse instead
+                of printing it and returning None
+        """
+        stats = ParseStats(_describe_source(source)) if self.collect_stats else None
         try:
-            with zipfile.ZipFile(file_path, 'r') as zip_ref:
+            with _phase(stats, 'unzip'):
+                zip_ref = _open_zip(source)
+            with zip_ref:
                 if 'project.json' in zip_ref.namelist():
-                    with zip_ref.open('project.json') as f:
-                        project_data = json.load(f)
-                        self._parse_project_data(project_data)
-                        return True
+                    if self.cache is None:
+                        targets, content_hash = self._parse_zip(zip_ref, stats=stats), None
+                    else:
+                        targets, content_hash = self._parse_zip_cached(zip_ref, stats)
                 else:
+                    if raise_errors:
+                        raise ValueError("Invalid Scratch file: project.json not found")
                     print("Invalid Scratch file: project.json not found")
-                    return False
+                    return None
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error parsing Scratch file: {e}")
-            return False
+            return None
+        
+        return ProjectModel.from_targets(targets, stats=stats, content_hash=content_hash)
+    
+    def parse_project_json(self, project_json, raise_errors=False):
+        """Parse an already extracted project.json; returns a ProjectModel or None
+        
+        Args:
+            project_json: The document as bytes, bytearray, memoryview or
+                str, a binary file object, or already decoded data (dict)
+            raise_errors: Raise the error that stopped the parse instead
+                of printing it and returning None
+        """
+        stats = ParseStats(_describe_source(project_json)) if self.collect_stats else None
+        content_hash = None
+        try:
+            if isinstance(project_json, dict):
+                targets = self._parse_project_data(project_json, stats)
+            elif hasattr(project_json, 'read'):
+                if self.streaming and self.cache is None:
+                    targets = self._parse_targets(iter_json_array(project_json, 'targets'), stats)
+                else:
+                    targets, content_hash = self._parse_json_cached(project_json.read(), stats)
+            else:
+                if isinstance(project_json, str):
+                    project_json = project_json.encode('utf-8')
+                targets, content_hash = self._parse_json_cached(project_json, stats)
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"Error parsing project.json: {e}")
+            return None
+        
+        return ProjectModel.from_targets(targets, stats=stats, content_hash=content_hash)
+    
+    def _parse_json_cached(self, project_json, stats=None):
+        """Parse project.json bytes, through the cache when one is configured
+        
+        Returns (targets, content hash), the hash being None without a cache.
+        """
+        if self.cache is None:
+            return self._parse_json(project_json, stats), None
+        with _phase(stats, 'hash'):
+            content_hash = hashlib.sha256(project_json).hexdigest()
+        targets = self._parse_cached(content_hash, lambda s: self._parse_json(project_json, s), stats)
+        return targets, content_hash
+    
+    def _parse_json(self, project_json, stats=None):
+        """Parse project.json bytes into a list of TargetResults"""
+        if self.streaming:
+            stream = io.BufferedReader(BufferReader(project_json))
+            return self._parse_targets(iter_json_array(stream, 'targets'), stats)
+        with _phase(stats, 'decode'):
+            data = self._json_loads(project_json)
+        return self._parse_project_data(data, stats)
+    
+    def _parse_zip(self, zip_ref, project_json=None, stats=None):
+        """Parse project.json from an open .sb3 archive into a list of TargetResults"""
+        if self.streaming:
+            with zip_ref.open('project.json') as f:
+                return self._parse_targets(iter_json_array(f, 'targets'), stats)
+        
+        # Read the member as bytes; the decoders handle UTF-8 themselves
+        if project_json is None:
+            with _phase(stats, 'unzip'):
+                project_json = zip_ref.read('project.json')
+        return self._parse_json(project_json, stats)
     
-    def _parse_project_data(self, data):
+    def _parse_zip_cached(self, zip_ref, stats=None):
+        """Parse project.json through the cache, keyed by its SHA-256
+        
+        Returns (targets, content hash).
+        """
+        if self.streaming:
+            # Hash in chunks so the whole document is never held in memory
+            project_json = None
+            digest = hashlib.sha256()
+            with _phase(stats, 'hash'), zip_ref.open('project.json') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            content_hash = digest.hexdigest()
+        else:
+            with _phase(stats, 'unzip'):
+                project_json = zip_ref.read('project.json')
+            with _phase(stats, 'hash'):
+                content_hash = hashlib.sha256(project_json).hexdigest()
+        
+        targets = self._parse_cached(content_hash, lambda s: self._parse_zip(zip_ref, project_json, s), stats)
+        return targets, content_hash
+    
+    def _parse_cached(self, content_hash, parse, stats=None):
+        """Return cached targets for a project.json digest, calling parse(stats) on a miss"""
+        # Results without block fingerprints are no use to reparse_sb3, so
+        # hashing parsers keep entries of their own
+        key = self.cache.make_key(content_hash, f'{PARSER_VERSION}-hashed' if self.hash_targets else PARSER_VERSION)
+        with _phase(stats, 'cache'):
+            state = self.cache.get(key)
+        if state is not None:
+            return self._load_state(state, stats)
+        
+        # Always count, so cached entries carry their counters
+        file_stats = stats if stats is not None else ParseStats()
+        targets = parse(file_stats)
+        with _phase(stats, 'cache'):
+            self.cache.put(key, {'targets': targets, 'counters': file_stats.counters()})
+        return targets
+    
+    def _load_state(self, state, stats=None):
+        """Return the targets of a cached entry, merging its counters into stats"""
+        # Unpickled names are fresh copies, so swap in the shared ones
+        for target in state['targets']:
+            target.intern_names(self.symbols)
+        if stats is not None:
+            stats.cache_hit = True
+            if state['counters']:
+                stats.merge_counters(state['counters'])
+        return state['targets']
+    
+    def _parse_project_data(self, data, stats=None):
         """Extract information from the project JSON data"""
         # Extract stage (background) as a sprite
-        if 'targets' in data:
-            for target in data['targets']:
+        targets = data.get('targets', [])
+        if self.workers and self.workers > 1 and len(targets) > 1:
+            total_blocks = sum(len(target.get('blocks') or ()) for target in targets)
+            if total_blocks >= self.parallel_min_blocks:
+                try:
+                    return self._parse_targets_parallel(targets, total_blocks, stats)
+                except BrokenProcessPool as e:
+                    print(f"Worker pool failed, parsing in-process: {e}")
+                    self.close()
+        return self._parse_targets(targets, stats)
+    
+    def _parse_targets_parallel(self, targets, total_blocks, stats=None):
+        """Process targets across the worker pool, merging results in target order"""
+        # A few chunks per worker of roughly equal block counts balances the
+        # load without paying per-target task overhead on tiny sprites
+        chunk_blocks = max(1, total_blocks // (self.workers * 4))
+        chunks = []
+        chunk = []
+        size = 0
+        # The pool's wall time, including serialisation, is counted as 'walk'
+        with _phase(stats, 'walk'):
+            for target in targets:
+                blocks = target.get('blocks')
+                chunk.append((target['name'], dumps_json(blocks) if blocks is not None else None))
+                size += len(blocks or ())
+                if size >= chunk_blocks:
+                    chunks.append(chunk)
+                    chunk = []
+                    size = 0
+            if chunk:
+                chunks.append(chunk)
+            
+            pool = self._get_pool()
+            backend = self._json_loads.backend
+            futures = [pool.submit(_process_target_chunk, backend, self.hash_targets, chunk)
+                       for chunk in chunks]
+            
+            results = []
+            chunk_counters = []
+            for future in futures:
+                chunk_results, counters = future.result()
+                # Names come back as fresh copies from the worker's own table
+                for target in chunk_results:
+                    target.intern_names(self.symbols)
+                results.extend(chunk_results)
+                chunk_counters.append(counters)
+        
+        if stats is not None:
+            for counters in chunk_counters:
+                stats.merge_counters(counters)
+        return results
+    
+    def _get_pool(self):
+        """Return the worker pool, starting it on first use"""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+    
+    def _parse_targets(self, targets, stats=None):
+        """Process each target (stage or sprite) in turn"""
+        results = []
+        targets = iter(targets)
+        while True:
+            # In streaming mode fetching a target is what decodes it
+            with _phase(stats, 'decode'):
+                target = next(targets, None)
+            if target is None:
+                break
+            
+            # Keep only what we use so costumes, sounds, variables and
+            # comments can be freed before the next target is decoded
+            sprite_name = target['name']
+            blocks = target.get('blocks')
+            del target
+            
+            results.append(self._process_target(sprite_name, blocks, stats=stats))
+        return results
+    
+    def _process_target(self, sprite_name, blocks, blocks_hash=None, stats=None):
+        """Process one target's blocks to identify its scripts, events and broadcasts"""
+        if blocks_hash is None and self.hash_targets and blocks is not None:
+            blocks_hash = hash_blocks(blocks)
+        sprite_name = self.symbols.canonical(sprite_name)
+        result = TargetResult(sprite_name, blocks_hash=blocks_hash)
+        if stats is not None:
+            stats.targets += 1
+        if blocks is None:
+            return result
+        
+        with _phase(stats, 'hats'):
+            walker = BlockWalker(self, blocks, stats)
+        
+        if stats is not None:
+            stats.blocks += len(blocks)
+            # Broadcast resolution is timed separately inside the walk
+            walk_start = time.perf_counter()
+            broadcast_time = stats.phases['broadcasts']
+        
+        for hat_id, event_name in walker.hats:
+            opcodes, messages, broadcasts = walker.walk_script(hat_id)
+            if stats is not None:
+                stats.count_script(len(opcodes), len(broadcasts))
+            
+            # Record a connection for every broadcast, including those made
+            # inside nested substacks and called custom blocks
+            for broadcast_message in broadcasts:
+                result.connections.append((
+                    sprite_name,
+                    event_name,
+                    None,  # Target sprite (all that listen to this message)
+                    self.symbols.canonical(f"receive_{broadcast_message}")  # Target event
+                ))
+            
+            # Add the compact script to our collection
+            result.scripts.setdefault(event_name, []).append(Script(opcodes, messages))
+        
+        if stats is not None:
+            walk_time = time.perf_counter() - walk_start
+            stats.add_time('walk', walk_time - (stats.phases['broadcasts'] - broadcast_time))
+        return result
+    
+    def reparse_sb3(self, source, model):
+        """Re-parse an edited project, reprocessing only targets whose blocks changed
+        
+        Targets are matched to the model's previous results by name and by
+        the fingerprint of their blocks. The given model is left untouched;
+        returns (new_model, ChangeSet), or None on failure.
+        """
+        previous = {target.name: target for target in model.targets}
+        targets = []
+        try:
+            with _open_zip(source) as zip_ref:
+                project_json = zip_ref.read('project.json')
+            content_hash = hashlib.sha256(project_json).hexdigest()
+            data = self._json_loads(project_json)
+            
+            for target in data.get('targets', []):
                 sprite_name = target['name']
-                self.sprites.append(sprite_name)
-                
-                # Process scripts for this sprite
-                if 'blocks' in target:
-                    self._process_blocks(sprite_name, target['blocks'])
-    
-    def _process_blocks(self, sprite_name, blocks):
-        """Process block definitions to identify scripts, events, and broadcasts"""
-        # Find all script entry points (hat blocks)
-        script_blocks = {}
-        
-        # First pass: identify script entry points
-        for block_id, block in blocks.items():
-            if block['topLevel'] and block['opcode'].startswith('event_'):
-                event_name = self._get_event_name(block)
-                if event_name:
-                    self.events.add(event_name)
-                    script_blocks[block_id] = (event_name, [])
-        
-        # Second pass: follow each script and collect blocks
-        for block_id, (event_name, script_blocks_list) in script_blocks.items():
-            current_id = block_id
-            while current_id:
-                block = blocks.get(current_id)
-                if not block:
-                    break
+                blocks = target.get('blocks')
+                blocks_hash = hash_blocks(blocks) if blocks is not None else None
                 
-                script_blocks_list.append(block)
-                
-                # Check for broadcast blocks
-                if block['opcode'] == 'event_broadcast' or block['opcode'] == 'event_broadcastandwait':
-                    broadcast_message = self._get_broadcast_message(block, blocks)
-                    if broadcast_message:
-                        # Record this connection
-                        self.connections.append((
-                            sprite_name,
-                            event_name,
-                            None,  # Target sprite (all that listen to this message)
-                            f"receive_{broadcast_message}"  # Target event
-                        ))
-                
-                # Move to next block in script
-                current_id = block.get('next')
-            
-            # Add complete script to our collection
-            self.scripts[(sprite_name, event_name)].append(script_blocks_list)
+                old = previous.get(sprite_name)
+                if old is not None and old.blocks_hash is not None and old.blocks_hash == blocks_hash:
+                    targets.append(old)
+                else:
+                    targets.append(self._process_target(sprite_name, blocks, blocks_hash))
+        except Exception as e:
+            print(f"Error re-parsing Scratch file: {e}")
+            return None
+        
+        new_model, changes = model.replace_targets(targets)
+        new_model.content_hash = content_hash
+        return new_model, changes
     
     def _get_event_name(self, block):
-        """Extract the event name from a hat block"""
+        """Extract the (interned) event name from a hat block"""
+        event_name = None
         if block['opcode'] == 'event_whenflagclicked':
-            return 'flag_clicked'
+            event_name = 'flag_clicked'
         elif block['opcode'] == 'event_whenkeypressed':
             key = self._get_input_value(block, 'KEY_OPTION')
-            return f'key_pressed_{key}'
+            event_name = f'key_pressed_{key}'
         elif block['opcode'] == 'event_whenbroadcastreceived':
             message = self._get_input_value(block, 'BROADCAST_OPTION')
-            return f'receive_{message}'
+            event_name = f'receive_{message}'
         elif block['opcode'] == 'event_whenstageclicked':
-            return 'stage_clicked'
+            event_name = 'stage_clicked'
         elif block['opcode'] == 'event_whenthisspriteclicked':
-            return 'sprite_clicked'
-        return None
+            event_name = 'sprite_clicked'
+        return self.symbols.canonical(event_name)
     
     def _get_broadcast_message(self, block, all_blocks):
         """Extract the broadcast message from a broadcast block"""
         if 'inputs' in block and 'BROADCAST_INPUT' in block['inputs']:
-            input_block_id = block['inputs']['BROADCAST_INPUT'][1]
-            if isinstance(input_block_id, str) and input_block_id in all_blocks:
-                input_block = all_blocks[input_block_id]
+            input_value = block['inputs']['BROADCAST_INPUT'][1]
+            # Saved projects usually inline the menu as [11, name, broadcast_id]
+            if isinstance(input_value, list) and len(input_value) > 1 and input_value[0] == 11:
+                return input_value[1]
+            if isinstance(input_value, str) and input_value in all_blocks:
+                input_block = all_blocks[input_value]
                 if 'fields' in input_block and 'BROADCAST_OPTION' in input_block['fields']:
                     return input_block['fields']['BROADCAST_OPTION'][0]
         return None
@@ -109,12 +627,3 @@ class ScratchParser:
         if 'fields' in block and input_name in block['fields']:
             return block['fields'][input_name][0]
         return None
-    
-    def get_codeorama_data(self):
-        """Return data structured for the CodeOrama visualization"""
-        return {
-            'sprites': self.sprites,
-            'events': sorted(list(self.events)),
-            'scripts': dict(self.scripts),
-            'connections': self.connections
-        }
\ No newline at end of file
@@ -0,0 +1,360 @@
+"""Headless, tiled rendering of large CodeOrama grid posters
+
+Example:
+    python poster.py project.sb3 --output-dir poster/ --dpi 300 --tile-size 2048
+
+The grid is laid out once exactly as CodeOramaVisualizer lays out a full
+size figure. Tiles of that layout are then rendered in worker processes
+with Agg. Each worker builds the grid scene once on a tile-sized figure
+and, for every tile, only moves the axes under it, so no process ever
+holds more than one tile of pixels and the stitched tiles match a single
+full-size render. The output directory gets:
+
+    tiles/<level>/<col>_<row>.png   Tile pyramid; the highest level is full
+                                    resolution and level 0 fits in one tile
+    poster.json                     Poster size, tile size, dpi and levels
+    poster.pdf                      One page per full-resolution tile, in
+                                    rows, at print size for the dpi
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import Collection
+from matplotlib.figure import Figure
+from PIL import Image
+
+from cache import ParseCache
+from model import ProjectModel
+from parser import ScratchParser
+from visualizer import CodeOramaVisualizer
+
+# Figure fractions don't depend on dpi, so the layout is found at this one
+# instead of allocating a renderer the size of the poster
+LAYOUT_DPI = 10
+# Pixels around a tile in which paths are still drawn, covering line widths,
+# miter joins and antialiasing
+CULL_MARGIN = 32
+
+# Per-worker state, set up once by _init_worker
+_visualizer = None
+_culler = None
+_layout = None
+
+
+def compute_layout(codeorama_data, dpi=300, tile_size=2048, config=None):
+    """Lay out the full grid figure and split it into tiles
+
+    Returns a dictionary with the poster's pixel size, the axes position
+    and the tile grid, which is all a worker needs to place any tile.
+    """
+    model = ProjectModel.from_data(codeorama_data)
+    visualizer = CodeOramaVisualizer()
+    figsize = visualizer.grid_figsize(len(model.sprites), len(model.events))
+
+    # The level-of-detail view records the same layout without drawing every script
+    figure = Figure(figsize=figsize, dpi=LAYOUT_DPI)
+    visualizer.visualize(model, config=config, level_of_detail=True, figure=figure)
+    figure_width, figure_height = figsize[0] * dpi, figsize[1] * dpi
+    # Agg renders whole pixels, truncating the figure size
+    width, height = int(figure_width), int(figure_height)
+    position = visualizer.ax.get_position()
+    # Halvings until the whole poster fits in one tile, plus full resolution
+    levels = max(0, math.ceil(math.log2(max(width, height) / tile_size))) + 1
+
+    return {
+        'dpi': dpi,
+        'tile_size': tile_size,
+        'width': width,
+        'height': height,
+        # The axes in poster pixels, measured from the bottom left
+        'axes': (position.x0 * figure_width, position.y0 * figure_height,
+                 position.width * figure_width, position.height * figure_height),
+        'columns': math.ceil(width / tile_size),
+        'rows': math.ceil(height / tile_size),
+        'levels': levels,
+    }
+
+
+def tile_position(layout, column, row, figure):
+    """Return the axes position that puts a tile of the poster on figure
+
+    Tiles are counted from the top left. The figure covers tile_size
+    pixels from the tile's top left corner; the axes usually extends
+    past it and is clipped.
+    """
+    tile_size = layout['tile_size']
+    figure_width, figure_height = figure.bbox.size
+    left, bottom, width, height = layout['axes']
+    # Poster coordinates of the figure's bottom left corner
+    x0 = column * tile_size
+    y0 = layout['height'] - (row + 1) * tile_size
+    return [(left - x0) / figure_width, (bottom - y0) / figure_height,
+            width / figure_width, height / figure_height]
+
+
+class _TileCuller:
+    """Leaves out the parts of a grid scene that cannot reach a tile
+
+    Agg clips everything outside the figure anyway, but only after
+    transforming every vertex, which makes each tile of a big poster cost
+    as much as the whole poster. Collections keep only the paths (or
+    labels placed at data offsets) whose bounds meet the tile, and any
+    other artist is hidden when its extent misses the tile. Path bounds
+    include curve control points, so they never cut a path that would
+    have been drawn.
+    """
+
+    def __init__(self, ax):
+        self.collections = []  # [(collection, paths, bounds, {property: per-path values})]
+        self.artists = []  # [(artist, bounds)]
+        renderer = ax.figure.canvas.get_renderer()
+        to_data = ax.transData.inverted()
+
+        for artist in (*ax.collections, *ax.patches, *ax.texts, *ax.lines):
+            if isinstance(artist, Collection) and np.any(artist.get_offsets()):
+                if artist.get_offset_transform() is ax.transData:
+                    self._add_collection(artist, ax)
+                continue
+            if artist.get_transform() is not ax.transData:
+                # Grid lines span the whole axis and are cheap to keep
+                continue
+            if isinstance(artist, Collection):
+                self._add_collection(artist)
+            else:
+                extent = to_data.transform(artist.get_window_extent(renderer).get_points())
+                self.artists.append((artist, np.concatenate([extent.min(axis=0), extent.max(axis=0)])))
+
+    def _add_collection(self, collection, ax=None):
+        """Track a collection; with ax, its paths are placed at data offsets"""
+        paths = list(collection.get_paths())
+        if not paths or any(dashes is not None for _, dashes in collection.get_linestyle()):
+            # Dash patterns are scaled by each path's width; keep such collections whole
+            return
+        # One solid style for every path, so widths can be cut down on their own
+        collection.set_linestyle('solid')
+        names = ['facecolor', 'edgecolor', 'linewidth']
+        if ax is None:
+            bounds = np.array([np.concatenate([path.vertices.min(axis=0), path.vertices.max(axis=0)])
+                               for path in paths])
+        else:
+            # Paths are in pixels around their offset, e.g. labels laid out in points
+            names.append('offsets')
+            transform = collection.get_transform()
+            offsets = ax.transData.transform(collection.get_offsets())
+            extents = transform.transform(np.array([
+                np.concatenate([path.vertices.min(axis=0), path.vertices.max(axis=0)]) for path in paths
+            ]).reshape(-1, 2)).reshape(-1, 4)
+            to_data = ax.transData.inverted()
+            lower = to_data.transform(offsets + extents[:, :2])
+            upper = to_data.transform(offsets + extents[:, 2:])
+            bounds = np.concatenate([np.minimum(lower, upper), np.maximum(lower, upper)], axis=1)
+        properties = {}
+        for name in names:
+            values = getattr(collection, 'get_' + name)()
+            if not isinstance(values, str) and len(values) == len(paths):
+                properties[name] = np.asarray(values)
+        self.collections.append((collection, paths, bounds, properties))
+
+    def apply(self, window):
+        """Show only what meets window, given as (x0, y0, x1, y1) in data units"""
+        x0, y0, x1, y1 = window
+
+        def meets(bounds):
+            return ((bounds[..., 0] <= x1) & (bounds[..., 2] >= x0) &
+                    (bounds[..., 1] <= y1) & (bounds[..., 3] >= y0))
+
+        for collection, paths, bounds, properties in self.collections:
+            keep = np.flatnonzero(meets(bounds))
+            collection.set_visible(len(keep) > 0)
+            Collection.set_paths(collection, [paths[i] for i in keep])
+            for name, values in properties.items():
+                getattr(collection, 'set_' + name)(values[keep])
+
+        for artist, bounds in self.artists:
+            artist.set_visible(bool(meets(bounds)))
+
+
+def _init_worker(codeorama_data, layout, options):
+    """Build the whole grid scene once per worker on a tile-sized figure"""
+    global _visualizer, _culler, _layout
+    _layout = layout
+    tile_size, dpi = layout['tile_size'], layout['dpi']
+
+    # A hair over tile_size so Agg's truncation still gives full tiles
+    figure = Figure(figsize=((tile_size + 0.01) / dpi,) * 2, dpi=dpi)
+    FigureCanvasAgg(figure)
+    _visualizer = CodeOramaVisualizer()
+    _visualizer.visualize(codeorama_data, level_of_detail=False, figure=figure,
+                          position=tile_position(layout, 0, 0, figure), **options)
+    _culler = _TileCuller(_visualizer.ax)
+
+
+def render_tile(column, row, output_path):
+    """Render one full-resolution tile to a PNG and return its path"""
+    figure = _visualizer.fig
+    ax = _visualizer.ax
+    ax.set_position(tile_position(_layout, column, row, figure))
+
+    tile_size = _layout['tile_size']
+    corners = ax.transData.inverted().transform([(-CULL_MARGIN, -CULL_MARGIN),
+                                                 (tile_size + CULL_MARGIN, tile_size + CULL_MARGIN)])
+    _culler.apply((*corners.min(axis=0), *corners.max(axis=0)))
+    figure.canvas.draw()
+
+    # Tiles on the right and bottom edges are cut to the poster
+    width = min(tile_size, _layout['width'] - column * tile_size)
+    height = min(tile_size, _layout['height'] - row * tile_size)
+    pixels = np.asarray(figure.canvas.buffer_rgba())[:height, :width, :3]
+    Image.fromarray(pixels).save(output_path)
+    return output_path
+
+
+def build_pyramid(tiles_dir, layout):
+    """Downsample the full-resolution tiles into lower pyramid levels
+
+    Each level halves the one above, pasting 2x2 tiles together and
+    scaling them down, until the whole poster fits in a single tile.
+    """
+    tile_size = layout['tile_size']
+    width, height = layout['width'], layout['height']
+
+    for level in range(layout['levels'] - 2, -1, -1):
+        source_dir = os.path.join(tiles_dir, str(level + 1))
+        level_dir = os.path.join(tiles_dir, str(level))
+        os.makedirs(level_dir, exist_ok=True)
+        source_width, source_height = width, height
+        width, height = math.ceil(width / 2), math.ceil(height / 2)
+
+        for row in range(math.ceil(height / tile_size)):
+            for column in range(math.ceil(width / tile_size)):
+                # The up to 2x2 source tiles covering this tile
+                left, top = column * 2 * tile_size, row * 2 * tile_size
+                merged = Image.new('RGB', (min(2 * tile_size, source_width - left),
+                                           min(2 * tile_size, source_height - top)), 'white')
+                for dy in (0, 1):
+                    for dx in (0, 1):
+                        if left + dx * tile_size >= source_width or top + dy * tile_size >= source_height:
+                            continue
+                        name = f"{column * 2 + dx}_{row * 2 + dy}.png"
+                        with Image.open(os.path.join(source_dir, name)) as source:
+                            merged.paste(source, (dx * tile_size, dy * tile_size))
+                tile_width = min(tile_size, width - column * tile_size)
+                tile_height = min(tile_size, height - row * tile_size)
+                merged = merged.resize((tile_width, tile_height), Image.LANCZOS)
+                merged.save(os.path.join(level_dir, f"{column}_{row}.png"))
+
+
+def write_pdf(pdf_path, tile_paths, layout):
+    """Write one page per full-resolution tile, sized to print at the layout's dpi"""
+    # Imported here so tile-only runs don't need reportlab
+    from reportlab.pdfgen.canvas import Canvas
+
+    points_per_pixel = 72.0 / layout['dpi']
+    pdf = Canvas(pdf_path)
+    for path in tile_paths:
+        with Image.open(path) as tile:
+            width, height = tile.size
+        page_size = (width * points_per_pixel, height * points_per_pixel)
+        pdf.setPageSize(page_size)
+        pdf.drawImage(path, 0, 0, *page_size)
+        pdf.showPage()
+    pdf.save()
+
+
+def render_poster(codeorama_data, output_dir, dpi=300, tile_size=2048, workers=None,
+                  edge_style='improved', show_message_names=True, config=None,
+                  script_folding=None, pdf=True):
+    """Render a grid poster as a tile pyramid (and PDF) and return a summary
+
+    Args:
+        codeorama_data: The parsed project data (a ProjectModel or equivalent dict)
+        output_dir: Directory for tiles/, poster.json and poster.pdf
+        dpi: Print resolution; the poster is the full grid figure size at this dpi
+        tile_size: Width and height of a tile in pixels
+        workers: Worker processes rendering tiles (default: CPU count)
+        edge_style, show_message_names, config, script_folding: As for
+            CodeOramaVisualizer.visualize
+        pdf: Whether to write poster.pdf
+    """
+    started = time.perf_counter()
+    model = ProjectModel.from_data(codeorama_data)
+    layout = compute_layout(model, dpi, tile_size, config)
+    options = {
+        'edge_style': edge_style,
+        'show_message_names': show_message_names,
+        'config': config,
+        'script_folding': script_folding,
+    }
+
+    tiles_dir = os.path.join(output_dir, 'tiles')
+    full_dir = os.path.join(tiles_dir, str(layout['levels'] - 1))
+    os.makedirs(full_dir, exist_ok=True)
+
+    # Row by row, the order the PDF pages follow
+    tiles = [(column, row, os.path.join(full_dir, f"{column}_{row}.png"))
+             for row in range(layout['rows']) for column in range(layout['columns'])]
+    workers = min(workers or os.cpu_count() or 1, len(tiles))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model, layout, options)) as executor:
+        tile_paths = list(executor.map(render_tile, *zip(*tiles)))
+
+    build_pyramid(tiles_dir, layout)
+    with open(os.path.join(output_dir, 'poster.json'), 'w') as f:
+        json.dump(layout, f, indent=2)
+    if pdf:
+        write_pdf(os.path.join(output_dir, 'poster.pdf'), tile_paths, layout)
+
+    return {
+        'width': layout['width'],
+        'height': layout['height'],
+        'tiles': len(tiles),
+        'levels': layout['levels'],
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Render a CodeOrama grid poster as tiles and a PDF")
+    arg_parser.add_argument('input', help=".sb3 project to render")
+    arg_parser.add_argument('--output-dir', required=True, help="Directory for the tiles, poster.json and poster.pdf")
+    arg_parser.add_argument('--dpi', type=int, default=300, help="Print resolution (default: 300)")
+    arg_parser.add_argument('--tile-size', type=int, default=2048, help="Tile width and height in pixels (default: 2048)")
+    arg_parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    arg_parser.add_argument('--edge-style', choices=['straight', 'curved', 'improved'], default='improved')
+    arg_parser.add_argument('--no-message-names', action='store_true', help="Leave message names off the edges")
+    arg_parser.add_argument('--config', help="Layout configuration JSON with sprite_order/event_order")
+    arg_parser.add_argument('--no-pdf', action='store_true', help="Only write the tile pyramid")
+    args = arg_parser.parse_args(argv)
+
+    model = ScratchParser(cache=ParseCache()).parse_sb3(args.input)
+    if model is None:
+        arg_parser.error(f"could not read {args.input}")
+    config = None
+    if args.config:
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+
+    summary = render_poster(
+        model,
+        args.output_dir,
+        dpi=args.dpi,
+        tile_size=args.tile_size,
+        workers=args.workers,
+        edge_style=args.edge_style,
+        show_message_names=not args.no_message_names,
+        config=config,
+        pdf=not args.no_pdf
+    )
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
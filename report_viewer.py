@@ -0,0 +1,165 @@
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListView, QComboBox,
+                            QLabel, QApplication, QAbstractItemView)
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+
+
+class ReportLineModel(QAbstractListModel):
+    """List model over the lines of a streamed report
+
+    Lines are pulled from the report's chunk stream in batches only when the
+    view asks for more (fetchMore), so opening a report with hundreds of
+    thousands of lines costs no more than its first page. Section header
+    lines are indexed as they arrive so the viewer can jump to them.
+    """
+
+    BATCH_LINES = 2000
+
+    def __init__(self, parent=None):
+        super(ReportLineModel, self).__init__(parent)
+        self._lines = []
+        self._pending = None  # Iterator over the lines not loaded yet
+        self._headers = {}  # {header line: [(kind, name), ...]}
+        self._sections = {}  # {(kind, name): row of its first header line}
+
+    def set_report(self, chunks, headers=None):
+        """Show a new report given as an iterable of text chunks
+
+        Args:
+            chunks: Report text chunks, e.g. from TextReportGenerator.iter_report
+            headers: Optional {header line: [(kind, name), ...]} section map
+        """
+        self.beginResetModel()
+        self._lines = []
+        self._pending = self._iter_lines(chunks)
+        self._headers = headers or {}
+        self._sections = {}
+        self.endResetModel()
+        # Fill the first page right away
+        self.fetchMore(QModelIndex())
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._lines)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self._lines[index.row()]
+        return None
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self._pending is not None
+
+    def fetchMore(self, parent):
+        """Load the next batch of lines from the report stream"""
+        if not self.canFetchMore(parent):
+            return
+
+        batch = []
+        for line in self._pending:
+            batch.append(line)
+            if len(batch) >= self.BATCH_LINES:
+                break
+        else:
+            # Stream exhausted
+            self._pending = None
+        if not batch:
+            return
+
+        start = len(self._lines)
+        self.beginInsertRows(QModelIndex(), start, start + len(batch) - 1)
+        self._lines.extend(batch)
+        self._index_sections(batch, start)
+        self.endInsertRows()
+
+    def fetch_section(self, kind, name):
+        """Load lines until a section's header is found; return its row or None"""
+        section = (kind, name)
+        while section not in self._sections and self._pending is not None:
+            self.fetchMore(QModelIndex())
+        return self._sections.get(section)
+
+    def _index_sections(self, lines, start):
+        """Record the first row of every section started in a batch of lines"""
+        if not self._headers:
+            return
+        for row, line in enumerate(lines, start):
+            for section in self._headers.get(line, ()):
+                self._sections.setdefault(section, row)
+
+    @staticmethod
+    def _iter_lines(chunks):
+        """Split a stream of text chunks into lines without their newlines"""
+        partial = ''
+        for chunk in chunks:
+            lines = (partial + chunk).split('\n')
+            # The last piece is the start of a line continued in the next chunk
+            partial = lines.pop()
+            yield from lines
+        if partial:
+            yield partial
+
+
+class ReportViewer(QWidget):
+    """Read-only report view that only lays out the visible lines"""
+
+    def __init__(self, parent=None):
+        super(ReportViewer, self).__init__(parent)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        # Section index for jumping to a sprite or message
+        jump_layout = QHBoxLayout()
+        jump_layout.addWidget(QLabel("Jump to:"))
+        self.section_combo = QComboBox()
+        self.section_combo.setMinimumContentsLength(30)
+        self.section_combo.activated.connect(self.jump_to_section)
+        jump_layout.addWidget(self.section_combo)
+        jump_layout.addStretch(1)
+        layout.addLayout(jump_layout)
+
+        self.model = ReportLineModel(self)
+        self.view = QListView()
+        self.view.setModel(self.model)
+        self.view.setFont(QApplication.font("Monospace"))
+        # Uniform rows let the view skip measuring lines that are off screen
+        self.view.setUniformItemSizes(True)
+        self.view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.view.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        layout.addWidget(self.view)
+
+    def show_report(self, chunks, headers=None):
+        """Display a report streamed from chunks, indexing its sections
+
+        Args:
+            chunks: Iterable of report text chunks
+            headers: Optional section header map from TextReportGenerator.section_headers
+        """
+        self.model.set_report(chunks, headers)
+        self.view.scrollToTop()
+
+        self.section_combo.clear()
+        self.section_combo.addItem("(Select a section)", None)
+        sections = {section for header in (headers or {}).values() for section in header}
+        for kind, name in sorted(sections):
+            label = "Message" if kind == 'message' else "Sprite"
+            self.section_combo.addItem(f"{label}: {name}", (kind, name))
+        self.section_combo.setEnabled(bool(sections))
+
+    def show_message(self, text):
+        """Display a short message instead of a report"""
+        self.show_report([text])
+
+    def jump_to_section(self, combo_index):
+        """Scroll to the section selected in the index, loading lines up to it"""
+        section = self.section_combo.itemData(combo_index)
+        if not section:
+            return
+
+        row = self.model.fetch_section(*section)
+        if row is None:
+            return
+        index = self.model.index(row)
+        self.view.scrollTo(index, QAbstractItemView.PositionAtTop)
+        self.view.setCurrentIndex(index)
@@ -0,0 +1,81 @@
+import json
+import time
+from contextlib import contextmanager
+
+# Parser phases, in the order they normally run
+PHASES = ('unzip', 'hash', 'cache', 'decode', 'hats', 'walk', 'broadcasts')
+
+
+class ParseStats:
+    """Phase timings and counters collected while parsing one project
+
+    Phase times are exclusive: time spent resolving broadcast messages is
+    counted under 'broadcasts' rather than 'walk'. In streaming mode
+    decompression happens while decoding, so 'unzip' only covers opening
+    the archive and the rest is counted under 'decode'. When targets are
+    processed by a worker pool, the pool's wall time is counted as 'walk'.
+    """
+
+    COUNTERS = ('targets', 'blocks', 'scripts', 'broadcasts',
+                'unresolved_broadcasts', 'max_script_length')
+
+    def __init__(self, source=None):
+        self.source = source  # Path of the parsed file, if known
+        self.cache_hit = False
+        self.phases = dict.fromkeys(PHASES, 0.0)  # {phase: seconds}
+        self.targets = 0
+        self.blocks = 0
+        self.scripts = 0
+        self.broadcasts = 0
+        self.unresolved_broadcasts = 0  # Broadcast blocks whose message could not be read
+        self.max_script_length = 0
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager adding the time spent inside it to a phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count_script(self, length, broadcasts):
+        """Record one walked script with its block count and number of broadcasts"""
+        self.scripts += 1
+        self.broadcasts += broadcasts
+        if length > self.max_script_length:
+            self.max_script_length = length
+
+    @property
+    def total(self):
+        """Total seconds across all phases"""
+        return sum(self.phases.values())
+
+    def counters(self):
+        """Return the counters as a plain dictionary"""
+        return {name: getattr(self, name) for name in self.COUNTERS}
+
+    def merge_counters(self, counters):
+        """Add counters from another parse (e.g. a cached result) to these"""
+        for name, value in counters.items():
+            if name == 'max_script_length':
+                self.max_script_length = max(self.max_script_length, value)
+            else:
+                setattr(self, name, getattr(self, name) + value)
+
+    def to_dict(self):
+        """Return the stats as JSON-serialisable data"""
+        data = {'source': self.source, 'cache_hit': self.cache_hit, 'total': round(self.total, 6)}
+        data['phases'] = {name: round(seconds, 6) for name, seconds in self.phases.items()}
+        data.update(self.counters())
+        return data
+
+    def to_json(self, **kwargs):
+        """Return the stats as a JSON string, e.g. for one line of a log"""
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def __repr__(self):
+        return f"ParseStats({self.to_json()})"
@@ -1,126 +1,438 @@
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from json_backend import dumps_json
+from model import BROADCAST_OPCODES, ProjectModel, message_name
+
+# Report names accepted by iter_report/write_report, mapped to their generators
+REPORT_TYPES = {
+    'broadcast': 'iter_broadcast_report',
+    'receive': 'iter_receive_report',
+    'script_layout': 'iter_script_layout',
+}
+
+# The same reports as JSON-lines record feeds
+RECORD_TYPES = {
+    'broadcast': 'iter_broadcast_records',
+    'receive': 'iter_receive_records',
+    'script_layout': 'iter_script_layout_records',
+}
+
+
 class TextReportGenerator:
+    """Builds the text reports as streams of lines
+    
+    The iter_* methods yield the report one line (or short chunk) at a
+    time, so huge projects can be written out in linear time without ever
+    holding the whole report in memory. The generate_* methods join them
+    into a single string for callers that want one.
+    """
+    
     def __init__(self, codeorama_data):
-        self.sprites = codeorama_data['sprites']
-        self.events = codeorama_data['events']
-        self.scripts = codeorama_data['scripts']
-        self.connections = codeorama_data['connections']
-        
+        self.model = ProjectModel.from_data(codeorama_data)
+        self.sprites = self.model.sprites
+        self.events = self.model.events
+        self.scripts = self.model.scripts
+        self.connections = self.model.connections
+    
     def generate_broadcast_report(self):
         """Generate a report of broadcast messages and their receivers"""
-        report = "BROADCAST REPORT\n===============\n\n"
+        return ''.join(self.iter_broadcast_report())
+    
+    def generate_receive_report(self):
+        """Generate a report of received messages and their broadcasters"""
+        return ''.join(self.iter_receive_report())
+    
+    def generate_script_layout(self):
+        """Generate a text-based layout of scripts with connections"""
+        return ''.join(self.iter_script_layout())
+    
+    def iter_report(self, report_type):
+        """Yield the chunks of a report by name ('broadcast', 'receive' or 'script_layout')"""
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f"Unknown report type: {report_type}")
+        return getattr(self, REPORT_TYPES[report_type])()
+    
+    def write_report(self, report_type, sink, batch_size=512):
+        """Write a report to a file-like sink and return the number of characters written
+        
+        Args:
+            report_type: 'broadcast', 'receive' or 'script_layout'
+            sink: Any object with a write(str) method, e.g. an open text file
+            batch_size: Number of chunks joined per write call
+        """
+        written = 0
+        chunks = self.iter_report(report_type)
+        while True:
+            # Joining small batches keeps write calls few without buffering everything
+            text = ''.join(islice(chunks, batch_size))
+            if not text:
+                return written
+            sink.write(text)
+            written += len(text)
+    
+    def iter_records(self, report_type):
+        """Yield a report as dict records by name ('broadcast', 'receive' or 'script_layout')"""
+        if report_type not in RECORD_TYPES:
+            raise ValueError(f"Unknown report type: {report_type}")
+        return getattr(self, RECORD_TYPES[report_type])()
+    
+    def write_records(self, report_type, sink, batch_size=512):
+        """Write a report as JSON lines to a binary sink and return the number of records
         
+        Args:
+            report_type: 'broadcast', 'receive' or 'script_layout'
+            sink: Any object with a write(bytes) method, e.g. a file opened in 'wb' mode
+            batch_size: Number of records joined per write call
+        """
+        count = 0
+        records = self.iter_records(report_type)
+        while True:
+            lines = [dumps_json(record) for record in islice(records, batch_size)]
+            if not lines:
+                return count
+            sink.write(b'\n'.join(lines) + b'\n')
+            count += len(lines)
+    
+    def iter_broadcast_records(self):
+        """Yield one record per sprite and message it broadcasts, with the receivers"""
+        for (sprite, message), receivers in self._broadcast_entries():
+            yield {'sprite': sprite, 'message': message, 'receivers': list(receivers)}
+    
+    def iter_receive_records(self):
+        """Yield one record per sprite and message it receives, with the broadcasters"""
+        for (sprite, message), broadcasters in self._receive_entries():
+            yield {'sprite': sprite, 'message': message, 'broadcasters': list(broadcasters)}
+    
+    def iter_script_layout_records(self):
+        """Yield one record per script block, in script layout order
+        
+        Script and block numbers start at 1, as in the text report. Broadcast
+        blocks carry their message and its receivers; other blocks have
+        message None and no receivers.
+        """
+        for sprite in self.sprites:
+            for event in self.model.get_sprite_events(sprite):
+                for script_number, script in enumerate(self.scripts[(sprite, event)], 1):
+                    messages = script.messages or {}
+                    for index, opcode in enumerate(script.opcodes):
+                        message = messages.get(index) if opcode in BROADCAST_OPCODES else None
+                        yield {
+                            'sprite': sprite,
+                            'event': event,
+                            'script': script_number,
+                            'block': index + 1,
+                            'opcode': opcode,
+                            'message': message or None,
+                            'receivers': list(self._get_receivers(sprite, message)) if message else []
+                        }
+    
+    def section_headers(self, report_type):
+        """Map each section header line of a report to the sections it starts
+        
+        Returns {line without its newline: [(kind, name), ...]} where kind is
+        'sprite' or 'message', so a viewer can index sections as lines stream in.
+        """
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f"Unknown report type: {report_type}")
+        
+        headers = {}
+        if report_type == 'script_layout':
+            for sprite in self.sprites:
+                headers[f"SPRITE: {sprite}"] = [('sprite', sprite)]
+        elif report_type == 'broadcast':
+            for source_sprite, _, _, target_event in self.connections:
+                message = message_name(target_event)
+                if message is not None:
+                    line = f"Sprite '{source_sprite}' broadcasts '{message}' to:"
+                    headers[line] = [('sprite', source_sprite), ('message', message)]
+        else:
+            for message in self.model.broadcasters:
+                for sprite in self.model.get_receivers(message):
+                    line = f"Sprite '{sprite}' receives '{message}' from:"
+                    headers[line] = [('sprite', sprite), ('message', message)]
+        return headers
+    
+    def iter_broadcast_report(self):
+        """Yield a report of broadcast messages and their receivers"""
+        yield "BROADCAST REPORT\n===============\n\n"
+        
+        # Format the report; every broadcaster of a message lists the same
+        # receivers, so each message's list is formatted only once
+        receiver_lines = {}
+        for (sprite, message), receivers in self._broadcast_entries():
+            yield f"Sprite '{sprite}' broadcasts '{message}' to:\n"
+            lines = receiver_lines.get(message)
+            if lines is None:
+                lines = receiver_lines[message] = self._format_list(receivers, "  (No receivers)\n")
+            yield lines
+    
+    def iter_receive_report(self):
+        """Yield a report of received messages and their broadcasters"""
+        yield "RECEIVE REPORT\n==============\n\n"
+        
+        # Format the report, formatting each message's broadcaster list once
+        broadcaster_lines = {}
+        for (sprite, message), broadcasters in self._receive_entries():
+            yield f"Sprite '{sprite}' receives '{message}' from:\n"
+            lines = broadcaster_lines.get(message)
+            if lines is None:
+                lines = broadcaster_lines[message] = self._format_list(broadcasters, "  (No broadcasters found)\n")
+            yield lines
+    
+    def iter_script_layout(self):
+        """Yield a text-based layout of scripts with connections"""
+        yield "SCRIPT LAYOUT\n=============\n\n"
+        
+        for sprite in self.sprites:
+            yield f"SPRITE: {sprite}\n"
+            yield "=" * (len(sprite) + 8) + "\n\n"
+            
+            # Events this sprite has scripts for, already in row order
+            for event in self.model.get_sprite_events(sprite):
+                yield f"EVENT: {event}\n"
+                yield "-" * (len(event) + 7) + "\n"
+                
+                # For each script in this event
+                for script_idx, script in enumerate(self.scripts[(sprite, event)]):
+                    yield f"Script #{script_idx + 1}:\n" + self._format_script(sprite, script) + "\n"
+            
+            yield "\n\n"
+    
+    def _broadcast_entries(self):
+        """Return sorted ((sprite, message), receivers) pairs for the broadcast report"""
         # Create a dictionary of broadcasts: {(sprite, message): [receiving_sprites]}
         broadcasts = {}
         for source_sprite, source_event, _, target_event in self.connections:
-            if target_event and target_event.startswith('receive_'):
-                message = target_event.replace('receive_', '')
-                key = (source_sprite, message)
-                if key not in broadcasts:
-                    broadcasts[key] = []
-                
-                # Find all sprites that receive this message
-                for sprite in self.sprites:
-                    if (sprite, f'receive_{message}') in self.scripts:
-                        if sprite not in broadcasts[key]:
-                            broadcasts[key].append(sprite)
-        
-        # Format the report
-        for (sprite, message), receivers in sorted(broadcasts.items()):
-            report += f"Sprite '{sprite}' broadcasts '{message}' to:\n"
-            if receivers:
-                for receiver in receivers:
-                    report += f"  - {receiver}\n"
-            else:
-                report += "  (No receivers)\n"
-            report += "\n"
+            message = message_name(target_event)
+            if message is not None:
+                # Receivers come straight from the model's message index
+                broadcasts[(source_sprite, message)] = self.model.get_receivers(message)
+        return sorted(broadcasts.items())
+    
+    def _receive_entries(self):
+        """Return sorted ((sprite, message), broadcasters) pairs for the receive report"""
+        # Create a dictionary of receives: {(sprite, message): [broadcasting_sprites]}
+        receives = {}
+        for message in self.model.broadcasters:
+            broadcasters = self.model.get_broadcasting_sprites(message)
             
+            # Every sprite that receives this message hears all its broadcasters
+            for sprite in self.model.get_receivers(message):
+                receives[(sprite, message)] = broadcasters
+        return sorted(receives.items())
+    
+    def _format_script(self, sprite, script):
+        """Format one line per block, annotating broadcasts with their receivers"""
+        # Work on opcode names and the sparse message map directly rather
+        # than building a Block view per block
+        opcodes = script.opcodes
+        lines = [f"  {opcode}\n" for opcode in opcodes]
+        for index, msg in (script.messages or {}).items():
+            opcode = opcodes[index]
+            if opcode not in BROADCAST_OPCODES or not msg:
+                continue
+            block_text = f"  {opcode} '{msg}'"
+            # Add receivers
+            receivers = self._get_receivers(sprite, msg)
+            if receivers:
+                block_text += " → " + ", ".join(receivers)
+            lines[index] = block_text + "\n"
+        return "".join(lines)
+    
+    def _format_list(self, names, empty_text):
+        """Format sprite names as '  - name' lines plus a blank line"""
+        if not names:
+            return empty_text + "\n"
+        return "".join(f"  - {name}\n" for name in names) + "\n"
+    
+    def _get_receivers(self, source_sprite, message):
+        """Get list of sprites that receive a specific message"""
+        return self.model.get_receivers(message)
+
+
+def _iter_text_chunks(text, size):
+    """Yield text in chunks of about size characters that end on a line break"""
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start + size)
+        end = len(text) if end < 0 else end + 1
+        yield text[start:end]
+        start = end
+
+
+class ReportCache:
+    """In-memory LRU cache of generated report text
+    
+    Entries are keyed by (project content, report type, sprite order, event
+    order), so reopening the same project or switching back to an earlier
+    report reuses the text, while any edit or reordering misses and the old
+    entries simply age out. Reports can also be precomputed on a background
+    thread right after a project loads.
+    
+    Memory is bounded in bytes as well as entries: a report bigger than
+    max_report_bytes is never kept (it is streamed again when asked for),
+    so multi-megabyte reports keep their bounded-memory streaming.
+    """
+    
+    # Cached reports are yielded in chunks of about this many characters,
+    # ending on a line break, so a viewer splits them a page at a time
+    CHUNK_SIZE = 64 * 1024
+    
+    def __init__(self, max_entries=6, max_bytes=32 * 1024 * 1024, max_report_bytes=8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes  # Total size of the cached text
+        self.max_report_bytes = max_report_bytes  # Larger reports are not cached
+        self._entries = OrderedDict()  # {key: report text}, least recently used first
+        self._size = 0  # Bytes held by self._entries
+        self._pending = {}  # {key: Future} for reports being precomputed
+        self._lock = threading.Lock()
+        self._executor = None  # Started on first precompute
+    
+    def make_key(self, model, report_type):
+        """Build the cache key for a report of a model as currently ordered"""
+        return (model.content_key, report_type, tuple(model.sprites), tuple(model.events))
+    
+    def get(self, model, report_type):
+        """Return a report's text, waiting for a precompute or generating it on a miss"""
+        key = self.make_key(model, report_type)
+        with self._lock:
+            report = self._entries.get(key)
+            if report is not None:
+                self._entries.move_to_end(key)
+                return report
+            future = self._pending.get(key)
+        
+        if future is not None and not future.cancelled():
+            try:
+                report = future.result()
+            except Exception as e:
+                print(f"Background report generation failed: {e}")
+        
+        if report is None:
+            # Not precomputed, or too big to have been kept
+            report = ''.join(TextReportGenerator(model).iter_report(report_type))
+            self._store(key, report)
         return report
     
-    def generate_receive_report(self):
-        """Generate a report of received messages and their broadcasters"""
-        report = "RECEIVE REPORT\n==============\n\n"
+    def iter_report(self, model, report_type):
+        """Yield a report's chunks, from the cache or streamed while being cached
         
-        # Create a dictionary of receives: {(sprite, message): [broadcasting_sprites]}
-        receives = {}
-        for source_sprite, source_event, _, target_event in self.connections:
-            if target_event and target_event.startswith('receive_'):
-                message = target_event.replace('receive_', '')
-                
-                # Find all sprites that receive this message
-                for sprite in self.sprites:
-                    if (sprite, f'receive_{message}') in self.scripts:
-                        key = (sprite, message)
-                        if key not in receives:
-                            receives[key] = []
-                        if source_sprite not in receives[key]:
-                            receives[key].append(source_sprite)
+        A precompute of the same report that is already running is waited
+        for and reused; one still queued is cancelled and the report is
+        streamed instead, so a viewer can start showing lines straight away.
+        """
+        key = self.make_key(model, report_type)
+        with self._lock:
+            report = self._entries.get(key)
+            if report is not None:
+                self._entries.move_to_end(key)
+            future = self._pending.get(key)
         
-        # Format the report
-        for (sprite, message), broadcasters in sorted(receives.items()):
-            report += f"Sprite '{sprite}' receives '{message}' from:\n"
-            if broadcasters:
-                for broadcaster in broadcasters:
-                    report += f"  - {broadcaster}\n"
+        if report is None and future is not None:
+            if future.cancel():
+                # Still queued behind other reports; stream it here instead
+                with self._lock:
+                    self._pending.pop(key, None)
             else:
-                report += "  (No broadcasters found)\n"
-            report += "\n"
-            
-        return report
+                try:
+                    report = future.result()
+                except Exception as e:
+                    print(f"Background report generation failed: {e}")
+        if report is not None:
+            yield from _iter_text_chunks(report, self.CHUNK_SIZE)
+            return
+        
+        chunks = []  # None once the report is too big to cache
+        size = 0
+        for chunk in TextReportGenerator(model).iter_report(report_type):
+            if chunks is not None:
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > self.max_report_bytes:
+                    chunks = None
+            yield chunk
+        # Only complete reports are stored
+        if chunks is not None:
+            self._store(key, ''.join(chunks))
     
-    def generate_script_layout(self):
-        """Generate a text-based layout of scripts with connections"""
-        report = "SCRIPT LAYOUT\n=============\n\n"
+    def peek(self, model, report_type):
+        """Return a cached report's text, or None without generating it"""
+        with self._lock:
+            return self._entries.get(self.make_key(model, report_type))
+    
+    def precompute(self, model, report_types=tuple(REPORT_TYPES)):
+        """Generate reports for a model on a background thread
         
-        for sprite in self.sprites:
-            report += f"SPRITE: {sprite}\n"
-            report += "=" * (len(sprite) + 8) + "\n\n"
+        Queued work for other projects that has not started yet is cancelled.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='report-precompute')
             
-            # Get all scripts for this sprite
-            sprite_scripts = {event: scripts for (s, event), scripts in self.scripts.items() if s == sprite}
+            content_key = model.content_key
+            for key, future in list(self._pending.items()):
+                if key[0] != content_key and future.cancel():
+                    del self._pending[key]
             
-            for event in self.events:
-                if event in sprite_scripts:
-                    report += f"EVENT: {event}\n"
-                    report += "-" * (len(event) + 7) + "\n"
-                    
-                    # For each script in this event
-                    for script_idx, script in enumerate(sprite_scripts[event]):
-                        report += f"Script #{script_idx + 1}:\n"
-                        
-                        # Print blocks with special handling for broadcasts
-                        for block in script:
-                            block_text = f"  {block['opcode']}"
-                            
-                            # Add special annotations for broadcasts and receives
-                            if block['opcode'] == 'event_broadcast' or block['opcode'] == 'event_broadcastandwait':
-                                msg = self._get_broadcast_message(block)
-                                if msg:
-                                    block_text += f" '{msg}'"
-                                    # Add receivers
-                                    receivers = self._get_receivers(sprite, msg)
-                                    if receivers:
-                                        block_text += " → " + ", ".join(receivers)
-                            
-                            report += block_text + "\n"
-                        
-                        report += "\n"
-            
-            report += "\n\n"
-            
-        return report
+            for report_type in report_types:
+                key = self.make_key(model, report_type)
+                if key in self._entries or key in self._pending:
+                    continue
+                self._pending[key] = self._executor.submit(self._generate, key, model, report_type)
     
-    def _get_broadcast_message(self, block):
-        """Try to extract message from a broadcast block"""
-        # This is a simplified version - actual implementation would be more complex
-        if 'inputs' in block and 'BROADCAST_INPUT' in block['inputs']:
-            # This is just a placeholder - actual implementation would extract from inputs
-            return "message_placeholder"
-        return None
+    def clear(self):
+        """Drop all cached reports"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
     
-    def _get_receivers(self, source_sprite, message):
-        """Get list of sprites that receive a specific message"""
-        receivers = []
-        for sprite in self.sprites:
-            if (sprite, f'receive_{message}') in self.scripts:
-                receivers.append(sprite)
-        return receivers
\ No newline at end of file
+    def shutdown(self):
+        """Cancel queued precomputes and stop the background thread"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+        if executor is not None:
+            executor.shutdown(wait=False)
+    
+    def _generate(self, key, model, report_type):
+        """Generate and store a report and clear its pending entry
+        
+        Returns the report, or None once it grows past max_report_bytes;
+        generation then stops instead of building a report that would not
+        be kept.
+        """
+        try:
+            chunks = []
+            size = 0
+            for chunk in TextReportGenerator(model).iter_report(report_type):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > self.max_report_bytes:
+                    return None
+            report = ''.join(chunks)
+            self._store(key, report)
+            return report
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+    
+    def _store(self, key, report):
+        """Add a report as the most recently used entry, evicting the oldest"""
+        size = sys.getsizeof(report)
+        if size > self.max_report_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= sys.getsizeof(previous)
+            self._entries[key] = report
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= sys.getsizeof(evicted)
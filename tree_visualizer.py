@@ -1,8 +1,10 @@
-import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 import numpy as np
 from matplotlib.path import Path
 
+from model import ProjectModel, RECEIVE_PREFIX
+from visualizer import prepare_figure
+
 class TreeVisualizer:
     def __init__(self):
         self.fig = None
@@ -14,10 +16,16 @@ class TreeVisualizer:
             'default': '#A0A0A0',  # gray
         }
     
-    def visualize(self, codeorama_data, root_event='flag_clicked', show_message_names=True):
-        """Create a hierarchical tree visualization starting from a root event"""
+    def visualize(self, codeorama_data, root_event='flag_clicked', show_message_names=True, figure=None):
+        """Create a hierarchical tree visualization starting from a root event
+        
+        Args:
+            figure: Figure to draw into, cleared first; a new one is created if None
+        """
+        codeorama_data = ProjectModel.from_data(codeorama_data)
+        
         # Create figure
-        self.fig, self.ax = plt.subplots(figsize=(14, 10))
+        self.fig, self.ax = prepare_figure(figure, (14, 10))
         
         # Find all scripts triggered by the root event
         root_scripts = []
@@ -42,7 +50,7 @@ class TreeVisualizer:
         
         # Adjust display
         self.ax.axis('off')
-        plt.tight_layout()
+        self.fig.tight_layout()
         
         return self.fig
     
@@ -109,15 +117,13 @@ class TreeVisualizer:
         """Find all scripts that are triggered by broadcasts from this script"""
         result = []
         
-        # Check connections to find broadcasts
-        for source_sprite, source_event, _, target_event in codeorama_data['connections']:
-            if source_sprite == sprite and source_event == event:
-                # This script broadcasts a message
-                # Find all scripts that receive this message
-                for target_sprite in codeorama_data['sprites']:
-                    if (target_sprite, target_event) in codeorama_data['scripts']:
-                        for i, _ in enumerate(codeorama_data['scripts'][(target_sprite, target_event)]):
-                            result.append((target_sprite, target_event, i))
+        # Messages this script's cell broadcasts, straight from the model index
+        for message in codeorama_data.get_cell_messages(sprite, event):
+            target_event = RECEIVE_PREFIX + message
+            # Find all scripts that receive this message
+            for target_sprite in codeorama_data.get_receivers(message):
+                for i, _ in enumerate(codeorama_data['scripts'][(target_sprite, target_event)]):
+                    result.append((target_sprite, target_event, i))
         
         return result
     
@@ -193,7 +199,7 @@ class TreeVisualizer:
         # Add first block opcode
         if script and len(script) > 0:
             first_block = script[0]
-            opcode = first_block.get('opcode', 'Unknown')
+            opcode = first_block.opcode
             # Format opcode for display
             opcode = opcode.split('_')[-1].replace('_', ' ').title()
             self.ax.text(x, y - 0.3, f"({opcode})",
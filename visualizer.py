@@ -1,17 +1,65 @@
-import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PatchCollection, PathCollection, PolyCollection
+from matplotlib.figure import Figure
+from matplotlib.font_manager import FontProperties
 from matplotlib.path import Path
 from matplotlib.textpath import TextPath
 from matplotlib.transforms import Affine2D
 
+from model import ProjectModel
+
+
+def prepare_figure(figure, figsize):
+    """Return a figure cleared for a new drawing and a fresh axes on it
+    
+    A figure passed in (e.g. one owned by a GUI canvas) is reused and keeps
+    its size. Otherwise a new one is made at figsize on a headless Agg
+    canvas; it never enters pyplot's figure registry, so it is freed as
+    soon as it is dropped.
+    """
+    if figure is None:
+        figure = Figure(figsize=figsize)
+        FigureCanvasAgg(figure)
+    else:
+        figure.clear()
+    return figure, figure.add_subplot()
+
+
 class CodeOramaVisualizer:
+    # Grids with more cells than this open in level-of-detail mode by default
+    LOD_MIN_CELLS = 400
+    # Most cells that may be in view before full block stacks are drawn
+    LOD_DETAIL_CELLS = 60
+    # Most aggregated cell-to-cell lines drawn at overview zoom
+    LOD_OVERVIEW_EDGES = 2000
+    
     def __init__(self):
         self.fig = None
         self.ax = None
         self.sprite_positions = {}
         self.event_positions = {}
         self.cell_contents = {}
+        # Script positions indexed for connection drawing
+        self.cell_index = {}  # {(sprite, event): [(x, y) per script]}
+        self.event_index = {}  # {event: [(sprite, [(x, y) per script])] in column order}
+        
+        # Shapes and labels collected while building the grid, drawn as
+        # one collection per layer instead of one artist each
+        self._layers = {'headers': [], 'hats': [], 'bodies': []}
+        self._labels = []  # [(x, y, text, fontsize, color, weight, style, ha, va, zorder, box)]
+        self._label_paths = {}  # {(text, fontsize, weight, style, ha, va): (aligned TextPath, bounds)}
+        self._lod = None  # Level-of-detail state while a zoomable view is shown
+        # Edge options and the overlay artists drawing them over the cached grid
+        self._edges = None
+        self._overlay = []
+        self._background = None  # Canvas pixels of the grid without the overlay
+        self._hooked_fig = None  # Figure whose draw_event paints the overlay
+        # Collections of each sprite column's scripts, so one column can be redrawn
+        self._columns = {}  # {sprite: [artists]}
+        self._script_folding = {}
+        self._grid_order = None  # Data's (sprites, events) the grid was laid out from
         
         # Color scheme for different script types
         self.block_colors = {
@@ -26,7 +74,8 @@ class CodeOramaVisualizer:
         }
         
     def visualize(self, codeorama_data, edge_style='improved', show_message_names=True, 
-                 config=None, script_folding=None):
+                 config=None, script_folding=None, level_of_detail=None, figure=None,
+                 position=None):
         """Create a visualization of the CodeOrama data
         
         Args:
@@ -35,6 +84,12 @@ class CodeOramaVisualizer:
             show_message_names: Whether to show message names on the edges
             config: Optional configuration dict with ordering preferences
             script_folding: Dict specifying which scripts are folded/unfolded
+            level_of_detail: Draw only what the current zoom needs (see
+                _update_level_of_detail); None turns it on for large grids
+            figure: Figure to draw into, cleared first; a new one is created if None
+            position: Axes position [left, bottom, width, height] in figure
+                coordinates to use instead of tight_layout, e.g. to draw one
+                tile of a larger layout
         """
         sprites = codeorama_data['sprites']
         events = codeorama_data['events']
@@ -56,30 +111,205 @@ class CodeOramaVisualizer:
             event_order.extend([e for e in events if e not in event_order])
             events = event_order
         
-        # Set up the figure and axis
-        fig_width = max(10, 2 * len(sprites))
-        fig_height = max(8, 1.5 * len(events))
-        self.fig, self.ax = plt.subplots(figsize=(fig_width, fig_height))
+        if level_of_detail is None:
+            level_of_detail = len(sprites) * len(events) > self.LOD_MIN_CELLS
+        
+        # Set up the figure and axis; a level-of-detail view stays screen
+        # sized and is explored by zooming instead
+        fig_width, fig_height = self.grid_figsize(len(sprites), len(events))
+        if level_of_detail:
+            fig_width, fig_height = min(fig_width, 16), min(fig_height, 10)
+        self.fig, self.ax = prepare_figure(figure, (fig_width, fig_height))
+        self._layers = {'headers': [], 'hats': [], 'bodies': []}
+        self._labels = []
+        self._lod = None
+        # Label outlines are only reused within one drawing
+        self._label_paths = {}
+        self._edges = {
+            'connections': connections,
+            'edge_style': edge_style,
+            'show_message_names': show_message_names,
+            'cells': None,  # Visible cells when culled by the level of detail
+            'overview': False,  # Aggregated edges at overview zoom
+        }
+        self._overlay = []
+        self._background = None
+        self._columns = {}
+        self._grid_order = (list(codeorama_data['sprites']), list(codeorama_data['events']))
+        self.sprite_positions = {}
+        self.event_positions = {}
+        self.cell_contents = {}
         
         # Create the grid
         self._create_grid(sprites, events)
+        script_folding = self._script_folding = script_folding or {}
         
-        # Add script blocks to cells
-        script_folding = script_folding or {}
-        self._add_scripts(scripts, script_folding)
-        
-        # Add connection arrows with the selected style
-        if edge_style == 'straight':
-            self._add_straight_connections(connections, show_message_names)
-        elif edge_style == 'curved':
-            self._add_curved_connections(connections, show_message_names)
+        if level_of_detail:
+            # Only record script positions here; what gets drawn follows the zoom
+            self._place_scripts(codeorama_data, scripts)
+            self._apply_layout(position)
+            self._lod = {
+                'scripts': scripts,
+                'folding': script_folding,
+                'overview_edges': self._aggregate_connections(connections),
+                'key': None,
+                'artists': [],
+            }
+            self.ax.callbacks.connect('xlim_changed', self._on_view_changed)
+            self.ax.callbacks.connect('ylim_changed', self._on_view_changed)
+            self._update_level_of_detail()
         else:
-            self._add_improved_connections(connections, show_message_names)
+            # Headers, then each column's script blocks as collections of its own
+            self._draw_layers()
+            self._apply_layout(position)
+            self._draw_labels()
+            for sprite in sprites:
+                self._draw_column(sprite, scripts)
+            self._build_cell_index()
+            
+            # Add connection arrows with the selected style
+            self._draw_overlay()
         
-        # Show the plot
-        plt.tight_layout()
+        if self._hooked_fig is not self.fig:
+            # Bound methods are only weakly referenced by the canvas; the lambda
+            # keeps the overlay drawing even if the caller drops this visualizer
+            self.fig.canvas.mpl_connect('draw_event', lambda event: self._on_draw(event))
+            self._hooked_fig = self.fig
         return self.fig
     
+    def grid_figsize(self, n_sprites, n_events):
+        """Return the (width, height) in inches of a full grid figure"""
+        return max(10, 2 * n_sprites), max(8, 1.5 * n_events)
+    
+    def update_edges(self, edge_style=None, show_message_names=None):
+        """Redraw only the edges and message names with new options
+        
+        The grid, headers and scripts are not re-rendered: the cached
+        background is restored and just the new overlay is blitted on top.
+        Returns False if there is no grid figure to update.
+        """
+        if self.fig is None or self._edges is None:
+            return False
+        if edge_style is not None:
+            self._edges['edge_style'] = edge_style
+        if show_message_names is not None:
+            self._edges['show_message_names'] = show_message_names
+        
+        for artist in self._overlay:
+            artist.remove()
+        self._draw_overlay()
+        
+        canvas = self.fig.canvas
+        if self._background is None or not hasattr(canvas, 'restore_region'):
+            # Nothing cached yet (or no blitting support); the next draw shows it
+            canvas.draw_idle()
+            return True
+        canvas.restore_region(self._background)
+        for artist in self._overlay:
+            self.ax.draw_artist(artist)
+        canvas.blit(self.fig.bbox)
+        return True
+    
+    def update_columns(self, codeorama_data, changes):
+        """Redraw only the sprite columns a ChangeSet marks as changed
+        
+        The rest of the grid and the current zoom are kept; the edge layer
+        is rebuilt from the new connections. Returns False if there is no
+        grid to update or its rows or columns changed, in which case the
+        grid has to be laid out again with visualize().
+        """
+        if self.fig is None or self._edges is None or changes.layout_changed:
+            return False
+        if (list(codeorama_data['sprites']), list(codeorama_data['events'])) != self._grid_order:
+            return False
+        
+        scripts = codeorama_data['scripts']
+        changed = [sprite for sprite in changes.changed_sprites if sprite in self.sprite_positions]
+        self.cell_contents = {
+            key: position for key, position in self.cell_contents.items() if key[0] not in changed
+        }
+        self._edges['connections'] = codeorama_data['connections']
+        
+        if self._lod is not None:
+            cells = [(sprite, event) for sprite in changed for event in self.event_positions
+                     if (sprite, event) in scripts]
+            self._place_scripts(codeorama_data, scripts, cells)
+            self._lod['scripts'] = scripts
+            self._lod['overview_edges'] = self._aggregate_connections(self._edges['connections'])
+            # Redraw the cells in view even though the zoom is unchanged
+            self._lod['key'] = None
+            self._update_level_of_detail()
+        else:
+            for sprite in changed:
+                for artist in self._columns.pop(sprite, ()):
+                    artist.remove()
+                self._draw_column(sprite, scripts)
+            self._build_cell_index()
+            for artist in self._overlay:
+                artist.remove()
+            self._draw_overlay()
+        
+        self.fig.canvas.draw_idle()
+        return True
+    
+    def _draw_column(self, sprite, scripts):
+        """Draw the scripts of one sprite column as collections kept in self._columns"""
+        self._layers = {'headers': [], 'hats': [], 'bodies': []}
+        self._labels = []
+        cells = [(sprite, event) for event in self.event_positions]
+        self._add_scripts(scripts, self._script_folding, cells=cells)
+        self._columns[sprite] = self._draw_layers() + self._draw_labels()
+    
+    def _draw_overlay(self):
+        """Add the connection layer (edges and message names) as animated artists
+        
+        Animated artists are left out of normal canvas draws; _on_draw
+        paints them over the grid afterwards, which keeps the grid alone in
+        the cached background.
+        """
+        edges = self._edges
+        before = set(self.ax.get_children())
+        self._labels = []
+        
+        cells = edges['cells']
+        if edges['overview']:
+            self._add_aggregated_connections(cells)
+        else:
+            connections = edges['connections']
+            if cells is not None:
+                connections = [c for c in connections if self._connection_in_view(c, cells)]
+            if edges['edge_style'] == 'straight':
+                self._add_straight_connections(connections, edges['show_message_names'], cells)
+            elif edges['edge_style'] == 'curved':
+                self._add_curved_connections(connections, edges['show_message_names'], cells)
+            else:
+                self._add_improved_connections(connections, edges['show_message_names'], cells)
+        self._draw_labels()
+        
+        # Sorted once so they can be painted in order
+        added = [artist for artist in self.ax.get_children() if artist not in before]
+        self._overlay = sorted(added, key=lambda artist: artist.get_zorder())
+        for artist in self._overlay:
+            artist.set_animated(True)
+    
+    def _on_draw(self, event):
+        """After a full draw, cache the grid for blitting and paint the overlay over it"""
+        if self.ax not in event.canvas.figure.axes:
+            # The figure has since been cleared for another view
+            return
+        canvas = event.canvas
+        if not canvas.is_saving() and hasattr(canvas, 'copy_from_bbox'):
+            self._background = canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self._overlay:
+            artist.draw(event.renderer)
+    
+    def _apply_layout(self, position):
+        """Fit the axes to the figure, or place it at a given position"""
+        if position is None:
+            self.fig.tight_layout()
+        else:
+            self.ax.set_position(position)
+    
     def _create_grid(self, sprites, events):
         """Create the grid with sprite columns and event rows"""
         # Set up axes
@@ -90,70 +320,78 @@ class CodeOramaVisualizer:
         self.ax.set_xticks([])
         self.ax.set_yticks([])
         
-        # Add sprite headers (columns) with Scratch-like styling
+        # Sprites are columns left to right, events rows top to bottom
         for i, sprite in enumerate(sprites):
-            x = i + 1
-            y = len(events) + 0.5
-            
-            # Add a background for sprite name - using FancyBboxPatch for rounded corners
-            sprite_bg = patches.FancyBboxPatch(
-                (x - 0.4, y - 0.3), 0.8, 0.6, 
-                boxstyle=patches.BoxStyle("Round", pad=0.02, rounding_size=0.1),
-                linewidth=1, edgecolor='black', facecolor='#4C97FF', alpha=0.7,
-                zorder=3
-            )
-            self.ax.add_patch(sprite_bg)
-            
-            # Add sprite name
-            self.ax.text(x, y, sprite, ha='center', va='center', fontsize=10, 
-                        color='white', fontweight='bold', zorder=4)
-            self.sprite_positions[sprite] = x
-            
-            # Draw vertical grid line
-            self.ax.axvline(x - 0.5, color='gray', linestyle='-', alpha=0.3)
-        
-        # Add event headers (rows) with Scratch-like styling
+            self.sprite_positions[sprite] = i + 1
         for i, event in enumerate(events):
-            x = 0.5
-            y = len(events) - i
-            
-            # Format event name for display
-            formatted_event = event.replace('_', ' ').title()
-            if formatted_event.startswith('Receive '):
-                formatted_event = 'Receive: ' + formatted_event[8:]
-            
-            # Add a background for event name - using FancyBboxPatch for rounded corners
-            event_color = self._get_event_color(event)
-            event_bg = patches.FancyBboxPatch(
-                (x - 0.4, y - 0.3), 0.8, 0.6, 
-                boxstyle=patches.BoxStyle("Round", pad=0.02, rounding_size=0.1),
-                linewidth=1, edgecolor='black', facecolor=event_color, alpha=0.7,
-                zorder=3
-            )
-            self.ax.add_patch(event_bg)
-            
-            # Add event name
-            self.ax.text(x, y, formatted_event, ha='center', va='center', 
-                        fontsize=8, color='black', zorder=4)
-            self.event_positions[event] = y
-            
-            # Draw horizontal grid line
-            self.ax.axhline(y + 0.5, color='gray', linestyle='-', alpha=0.3)
-            
-        # Draw final grid lines
-        self.ax.axvline(len(sprites) + 0.5, color='gray', linestyle='-', alpha=0.3)
-        self.ax.axhline(0.5, color='gray', linestyle='-', alpha=0.3)
+            self.event_positions[event] = len(events) - i
+        
+        # Add sprite headers (columns) and event headers (rows) with Scratch-like styling
+        for sprite in sprites:
+            self._add_sprite_header(sprite)
+        for event in events:
+            self._add_event_header(event)
+        
+        # Draw the grid lines as one collection per direction, spanning the
+        # whole axis like axvline/axhline
+        self.ax.vlines([i + 0.5 for i in range(len(sprites) + 1)], 0, 1,
+                       transform=self.ax.get_xaxis_transform(), colors='gray', alpha=0.3)
+        self.ax.hlines([i + 0.5 for i in range(len(events) + 1)], 0, 1,
+                       transform=self.ax.get_yaxis_transform(), colors='gray', alpha=0.3)
     
-    def _add_scripts(self, scripts, script_folding=None):
-        """Add script blocks to the grid cells using Scratch-like styling
+    def _add_sprite_header(self, sprite):
+        """Queue a sprite's column header above the top row"""
+        x = self.sprite_positions[sprite]
+        y = len(self.event_positions) + 0.5
+        
+        # Add a background for sprite name - using FancyBboxPatch for rounded corners
+        sprite_bg = patches.FancyBboxPatch(
+            (x - 0.4, y - 0.3), 0.8, 0.6, 
+            boxstyle=patches.BoxStyle("Round", pad=0.02, rounding_size=0.1),
+            linewidth=1, edgecolor='black', facecolor='#4C97FF', alpha=0.7
+        )
+        self._layers['headers'].append(sprite_bg)
+        
+        # Add sprite name
+        self._add_label(x, y, sprite, 10, color='white', weight='bold', zorder=4)
+    
+    def _add_event_header(self, event):
+        """Queue an event's row header left of the first column"""
+        x = 0.5
+        y = self.event_positions[event]
+        
+        # Format event name for display
+        formatted_event = event.replace('_', ' ').title()
+        if formatted_event.startswith('Receive '):
+            formatted_event = 'Receive: ' + formatted_event[8:]
+        
+        # Add a background for event name - using FancyBboxPatch for rounded corners
+        event_color = self._get_event_color(event)
+        event_bg = patches.FancyBboxPatch(
+            (x - 0.4, y - 0.3), 0.8, 0.6, 
+            boxstyle=patches.BoxStyle("Round", pad=0.02, rounding_size=0.1),
+            linewidth=1, edgecolor='black', facecolor=event_color, alpha=0.7
+        )
+        self._layers['headers'].append(event_bg)
+        
+        # Add event name
+        self._add_label(x, y, formatted_event, 8, zorder=4)
+    
+    def _add_scripts(self, scripts, script_folding, cells):
+        """Add script blocks to grid cells using Scratch-like styling
         
         Args:
             scripts: Dictionary of scripts indexed by (sprite, event)
             script_folding: Dictionary indicating folding state {(sprite, event, script_idx): is_folded}
+            cells: (sprite, event) cells to draw, in drawing order; callers
+                rebuild the cell index once their cells are all added
         """
         script_folding = script_folding or {}
+        # Only the drawn cells' scripts are looked up, so a lazily loaded
+        # model unpacks just the sprites being drawn
+        cell_scripts = ((cell, scripts[cell]) for cell in cells if cell in scripts)
         
-        for (sprite, event), script_list in scripts.items():
+        for (sprite, event), script_list in cell_scripts:
             if sprite in self.sprite_positions and event in self.event_positions:
                 x = self.sprite_positions[sprite]
                 y = self.event_positions[event]
@@ -178,7 +416,176 @@ class CodeOramaVisualizer:
                     
                     # Store the cell for connection drawing with offset to account for multiple scripts
                     self.cell_contents[(sprite, event, i)] = (x + offset, y + offset)
+    
+    def _place_scripts(self, codeorama_data, scripts, cells=None):
+        """Record script positions from the cells' script counts alone
+        
+        No Script is looked up, so the scripts of a lazily loaded model stay
+        packed until their cells are drawn in detail. Every cell of scripts
+        is placed unless a list of (sprite, event) cells is given.
+        """
+        if isinstance(codeorama_data, ProjectModel):
+            script_count = codeorama_data.script_count
+        else:
+            script_count = lambda sprite, event: len(scripts[(sprite, event)])
+        
+        for sprite, event in (scripts if cells is None else cells):
+            if sprite in self.sprite_positions and event in self.event_positions:
+                x = self.sprite_positions[sprite]
+                y = self.event_positions[event]
+                for i in range(script_count(sprite, event)):
+                    # Same offsets as _add_scripts
+                    offset = i * 0.1
+                    self.cell_contents[(sprite, event, i)] = (x + offset, y + offset)
+        
+        self._build_cell_index()
+    
+    def _build_cell_index(self):
+        """Index script positions by (sprite, event) and by event
+        
+        Connection drawing looks endpoints up here instead of scanning
+        cell_contents for every connection and sprite.
+        """
+        self.cell_index = {}
+        for (sprite, event, _), position in self.cell_contents.items():
+            self.cell_index.setdefault((sprite, event), []).append(position)
+        
+        # Receivers of each event, sprites in column order as drawn
+        self.event_index = {}
+        for sprite in self.sprite_positions:
+            for event in self.event_positions:
+                cells = self.cell_index.get((sprite, event))
+                if cells:
+                    self.event_index.setdefault(event, []).append((sprite, cells))
 
+    def _on_view_changed(self, ax):
+        """Axis limit callback: redraw for the new zoom and viewport"""
+        if self._lod is not None:
+            self._update_level_of_detail()
+    
+    def _update_level_of_detail(self):
+        """Draw the cells, edges and headers the current view needs
+        
+        While many cells are in view (overview zoom), every cell is drawn
+        as one folded box and connections as aggregated cell-to-cell lines.
+        Once at most LOD_DETAIL_CELLS cells are visible, full block stacks
+        are drawn for those cells only, with the selected edge style for
+        connections that touch them. Only headers in view are drawn, and
+        overview labels only once the cells are big enough to read them.
+        """
+        lod = self._lod
+        x0, x1 = sorted(self.ax.get_xlim())
+        y0, y1 = sorted(self.ax.get_ylim())
+        sprites = [s for s, x in self.sprite_positions.items() if x0 - 0.5 <= x <= x1 + 0.5]
+        events = [e for e, y in self.event_positions.items() if y0 - 0.5 <= y <= y1 + 0.5]
+        detail = len(sprites) * len(events) <= self.LOD_DETAIL_CELLS
+        
+        # Panning within the same cells and zoom changes nothing
+        key = (detail, tuple(sprites), tuple(events), round(x1 - x0, 3), round(y1 - y0, 3))
+        if key == lod['key']:
+            return
+        lod['key'] = key
+        
+        for artist in lod['artists'] + self._overlay:
+            artist.remove()
+        self._overlay = []
+        before = set(self.ax.get_children())
+        self._layers = {'headers': [], 'hats': [], 'bodies': []}
+        self._labels = []
+        
+        for sprite in sprites:
+            self._add_sprite_header(sprite)
+        for event in events:
+            self._add_event_header(event)
+        
+        visible = {(sprite, event) for sprite in sprites for event in events}
+        if detail:
+            cells = [(sprite, event) for sprite in sprites for event in events]
+            self._add_scripts(lod['scripts'], lod['folding'], cells=cells)
+        else:
+            for cell in visible:
+                scripts = self.cell_index.get(cell)
+                if scripts:
+                    self._add_folded_cell(cell, len(scripts))
+        self._draw_layers()
+        
+        if not detail and not self._labels_fit(x1 - x0, y1 - y0):
+            # Cells are too small to read any labels at this zoom
+            self._labels = []
+        self._draw_labels()
+        lod['artists'] = [a for a in self.ax.get_children() if a not in before]
+        
+        # Edges for the cells in view go on the overlay
+        self._edges['cells'] = visible
+        self._edges['overview'] = not detail
+        self._draw_overlay()
+    
+    def _add_aggregated_connections(self, cells):
+        """Draw the heaviest aggregated edges touching cells, up to LOD_OVERVIEW_EDGES"""
+        segments = []
+        widths = []
+        for source, target, count in self._lod['overview_edges']:
+            if source in cells or target in cells:
+                segments.append((self._cell_center(source), self._cell_center(target)))
+                widths.append(0.5 + np.log2(count))
+                if len(segments) >= self.LOD_OVERVIEW_EDGES:
+                    break
+        if segments:
+            edges = LineCollection(segments, colors='red', linewidths=widths, alpha=0.4)
+            self.ax.add_collection(edges, autolim=False)
+    
+    def _labels_fit(self, x_span, y_span):
+        """Whether a grid cell is big enough on screen for its labels"""
+        bbox = self.ax.get_window_extent()
+        points_per_pixel = 72.0 / self.fig.dpi
+        cell_width = bbox.width * points_per_pixel / x_span
+        cell_height = bbox.height * points_per_pixel / y_span
+        return cell_width >= 40 and cell_height >= 15
+    
+    def _aggregate_connections(self, connections):
+        """Count script-to-script edges per (source cell, receiving cell) pair
+        
+        Returns [((sprite, event), (sprite, event), edge count)], heaviest
+        first, for the overview, where each pair of cells gets one line.
+        """
+        counts = {}
+        for source_sprite, source_event, _, target_event in connections:
+            if not (source_sprite and source_event and target_event):
+                continue
+            if (source_sprite, source_event) not in self.cell_index:
+                continue
+            for sprite, receive_cells in self.event_index.get(target_event, ()):
+                pair = ((source_sprite, source_event), (sprite, target_event))
+                counts[pair] = counts.get(pair, 0) + len(receive_cells)
+        edges = [(source, target, count) for (source, target), count in counts.items()]
+        edges.sort(key=lambda edge: -edge[2])
+        return edges
+    
+    def _connection_in_view(self, connection, visible):
+        """Whether a connection's source or any of its receiving cells is visible"""
+        source_sprite, source_event, _, target_event = connection
+        if (source_sprite, source_event) in visible:
+            return True
+        return any((sprite, target_event) in visible
+                   for sprite, _ in self.event_index.get(target_event, ()))
+    
+    def _cell_center(self, cell):
+        """Grid coordinates of a (sprite, event) cell"""
+        sprite, event = cell
+        return (self.sprite_positions[sprite], self.event_positions[event])
+    
+    def _add_folded_cell(self, cell, script_count):
+        """Add one folded box standing for all scripts in a cell (overview zoom)"""
+        x, y = self._cell_center(cell)
+        width, height = 0.8, 0.4
+        rect = patches.FancyBboxPatch(
+            (x - width/2, y - height/2), width, height,
+            boxstyle=patches.BoxStyle("Round", pad=0.02, rounding_size=0.1),
+            linewidth=1.5, edgecolor='black', facecolor=self._get_event_color(cell[1]), alpha=0.8
+        )
+        self._layers['bodies'].append(rect)
+        self._add_label(x, y, f"{script_count} script{'s' if script_count != 1 else ''}", 7, weight='bold')
+    
     def _add_folded_script(self, x, y, color, script):
         """Add a folded script block (minimal representation)"""
         width, height = 0.8, 0.4
@@ -189,20 +596,18 @@ class CodeOramaVisualizer:
             boxstyle=patches.BoxStyle("Round", pad=0.02, rounding_size=0.1),
             linewidth=1.5, edgecolor='black', facecolor=color, alpha=0.8
         )
-        self.ax.add_patch(rect)
+        self._layers['bodies'].append(rect)
         
         # Add script label (first opcode or event type)
         if script and len(script) > 0:
             first_block = script[0]
-            label = first_block.get('opcode', 'Unknown').split('_')[-1]
+            label = first_block.opcode.split('_')[-1]
             # Simplify label
             label = label.replace('whenflagclicked', 'Flag')
             label = label.replace('whenbroadcastreceived', 'Receive')
             label = label.replace('whenkeypressed', 'Key')
             
-            self.ax.text(x, y, f"{label} (+{len(script)-1} blocks)", 
-                        ha='center', va='center', fontsize=7, 
-                        color='black', fontweight='bold')
+            self._add_label(x, y, f"{label} (+{len(script)-1} blocks)", 7, weight='bold')
 
     def _add_detailed_script(self, x, y, color, script):
         """Add a more detailed script block with multiple blocks shown"""
@@ -237,33 +642,130 @@ class CodeOramaVisualizer:
                     hat_points, closed=True, 
                     facecolor=block_color, edgecolor='black', linewidth=1
                 )
-                self.ax.add_patch(hat_polygon)
+                self._layers['hats'].append(hat_polygon)
             else:  # Regular block
                 block_rect = patches.FancyBboxPatch(
                     (x - base_width/2, block_y - block_height/2), base_width, block_height,
                     boxstyle=patches.BoxStyle("Round", pad=0.02, rounding_size=0.05),
                     linewidth=1, edgecolor='black', facecolor=block_color, alpha=0.8
                 )
-                self.ax.add_patch(block_rect)
+                self._layers['bodies'].append(block_rect)
             
             # Add block label
             if i < len(script):
                 block = script[i]
-                opcode = block.get('opcode', 'Unknown')
+                opcode = block.opcode
                 # Format opcode for display
                 label = self._format_opcode_for_display(opcode)
                 
-                self.ax.text(x, block_y, label, 
-                            ha='center', va='center', fontsize=6, 
-                            color='black', fontweight='bold')
+                self._add_label(x, block_y, label, 6, weight='bold')
         
         # If there are more blocks not shown, add an indicator
         if len(script) > visible_blocks:
             more_y = y - (visible_blocks * block_height)
-            self.ax.text(x, more_y, f"+ {len(script) - visible_blocks} more blocks", 
-                        ha='center', va='top', fontsize=6, 
-                        color='gray', style='italic')
+            self._add_label(x, more_y, f"+ {len(script) - visible_blocks} more blocks", 6,
+                            color='gray', style='italic', va='top')
 
+    def _add_label(self, x, y, text, fontsize, color='black', weight='normal', style='normal',
+                   ha='center', va='center', zorder=3, box=None):
+        """Queue a label for _draw_labels
+        
+        Args:
+            ha: 'center' or 'left'; va: 'center' or 'top'
+            zorder: Drawing order of the text (its box goes just below it)
+            box: Optional (facecolor, edgecolor, pad) for a rounded background,
+                with pad as a fraction of the font size like Text bbox pads
+        """
+        self._labels.append((x, y, text, fontsize, color, weight, style, ha, va, zorder, box))
+    
+    def _draw_layers(self):
+        """Add the queued header, hat and body shapes as one collection per layer
+        
+        Returns the collections added.
+        """
+        added = []
+        # Bodies are drawn above hats and headers above everything, as
+        # individual patches of these kinds used to be
+        for name, zorder in (('hats', 1), ('bodies', 1), ('headers', 3)):
+            shapes = self._layers[name]
+            if shapes:
+                collection = PatchCollection(shapes, match_original=True, zorder=zorder)
+                added.append(self.ax.add_collection(collection, autolim=False))
+        return added
+    
+    def _draw_labels(self):
+        """Draw the queued labels as filled text outlines, one artist per layer
+        
+        Text is laid out once per distinct label as a TextPath in points.
+        Each layer's labels go into one collection that places them at
+        their data positions and scales them from points to pixels at draw
+        time, so glyphs keep their shape however the axes is resized or
+        zoomed, and thousands of block labels cost a handful of artists.
+        Label backgrounds are batched into one collection per layer as well.
+        Returns the collections added.
+        """
+        added = []
+        if not self._labels:
+            return added
+        
+        # Points to pixels, following the figure's dpi (e.g. when saving)
+        points_to_pixels = Affine2D().scale(1 / 72) + self.fig.dpi_scale_trans
+        
+        groups = {}  # {zorder: ([paths], [positions], [colors])}
+        boxes = {}  # {zorder: ([background paths], [positions], [facecolors], [edgecolors])}
+        for x, y, text, fontsize, color, weight, style, ha, va, zorder, box in self._labels:
+            path, (left, bottom, right, top) = self._get_label_path(text, fontsize, weight, style, ha, va)
+            group = groups.setdefault(zorder, ([], [], []))
+            group[0].append(path)
+            group[1].append((x, y))
+            group[2].append(color)
+            
+            if box:
+                facecolor, edgecolor, pad = box
+                pad *= fontsize
+                background = patches.BoxStyle("Round", pad=0, rounding_size=pad)(
+                    left - pad, bottom - pad, right - left + 2 * pad, top - bottom + 2 * pad, 1
+                )
+                group = boxes.setdefault(zorder, ([], [], [], []))
+                group[0].append(background)
+                group[1].append((x, y))
+                group[2].append(facecolor)
+                group[3].append(edgecolor)
+        
+        for zorder, (paths, positions, facecolors, edgecolors) in boxes.items():
+            collection = PathCollection(
+                paths, offsets=positions, offset_transform=self.ax.transData,
+                transform=points_to_pixels, facecolors=facecolors, edgecolors=edgecolors,
+                linewidths=1, alpha=0.7, zorder=zorder - 0.01
+            )
+            added.append(self.ax.add_collection(collection, autolim=False))
+        
+        for zorder, (paths, positions, colors) in groups.items():
+            collection = PathCollection(
+                paths, offsets=positions, offset_transform=self.ax.transData,
+                transform=points_to_pixels, facecolors=colors, edgecolors='none',
+                linewidths=0, zorder=zorder
+            )
+            added.append(self.ax.add_collection(collection, autolim=False))
+        return added
+    
+    def _get_label_path(self, text, fontsize, weight, style, ha, va):
+        """Return a label's TextPath in points, aligned on the origin, and its bounds"""
+        key = (text, fontsize, weight, style, ha, va)
+        cached = self._label_paths.get(key)
+        if cached is None:
+            prop = FontProperties(size=fontsize, weight=weight, style=style)
+            text_path = TextPath((0, 0), text, prop=prop)
+            x0 = y0 = x1 = y1 = 0
+            if len(text_path.vertices):
+                # Control point bounds are close enough to the glyph bounds
+                (x0, y0), (x1, y1) = text_path.vertices.min(axis=0), text_path.vertices.max(axis=0)
+            dx = -x0 if ha == 'left' else -(x0 + x1) / 2
+            dy = -y1 if va == 'top' else -(y0 + y1) / 2
+            path = Affine2D().translate(dx, dy).transform_path(text_path)
+            cached = self._label_paths[key] = (path, (x0 + dx, y0 + dy, x1 + dx, y1 + dy))
+        return cached
+    
     def _format_opcode_for_display(self, opcode):
         """Format an opcode for display in a script block"""
         # Remove the prefix (e.g., 'event_', 'motion_', etc.)
@@ -300,7 +802,7 @@ class CodeOramaVisualizer:
 
     def _get_block_color(self, block):
         """Get color for a specific block based on its category"""
-        opcode = block.get('opcode', 'unknown')
+        opcode = block.opcode
         category = opcode.split('_')[0] if '_' in opcode else 'unknown'
         
         # Expanded color scheme for different block categories
@@ -319,27 +821,32 @@ class CodeOramaVisualizer:
         
         return category_colors.get(category, self.block_colors['default'])
     
-    def _add_straight_connections(self, connections, show_message_names=True):
-        """Add straight line arrows between scripts that broadcast and receive messages"""
+    def _add_straight_connections(self, connections, show_message_names=True, cells=None):
+        """Add straight line arrows between scripts that broadcast and receive messages
+        
+        Args:
+            cells: Optional set of visible (sprite, event) cells; edges with
+                neither end in one of them are skipped
+        """
         for source_sprite, source_event, target_sprite, target_event in connections:
             if source_sprite and source_event and target_event:
                 # Find the source cell - use first script in the cell
-                source_key = next((k for k in self.cell_contents.keys() 
-                                  if k[0] == source_sprite and k[1] == source_event), None)
+                source_cells = self.cell_index.get((source_sprite, source_event))
                 
-                if source_key:
-                    source_x, source_y = self.cell_contents[source_key]
+                if source_cells:
+                    source_x, source_y = source_cells[0]
                     
                     # For broadcast messages, draw arrows to all receiving scripts
                     receivers_found = False
-                    for sprite in self.sprite_positions:
-                        # Find all scripts that receive this message
-                        receive_keys = [k for k in self.cell_contents.keys() 
-                                      if k[0] == sprite and k[1] == target_event]
-                        
-                        for receive_key in receive_keys:
+                    culled = cells is not None and (source_sprite, source_event) not in cells
+                    for sprite, receive_cells in self.event_index.get(target_event, ()):
+                        if culled and (sprite, target_event) not in cells:
+                            # Neither end of this edge is in view
+                            receivers_found = True
+                            continue
+                        # All scripts of this sprite that receive this message
+                        for target_x, target_y in receive_cells:
                             receivers_found = True
-                            target_x, target_y = self.cell_contents[receive_key]
                             
                             # Draw arrow from source to target
                             arrow = self.ax.annotate(
@@ -367,27 +874,32 @@ class CodeOramaVisualizer:
                             bbox=dict(boxstyle="round,pad=0.2", fc="white", ec="red", alpha=0.7)
                         )
     
-    def _add_curved_connections(self, connections, show_message_names=True):
-        """Add curved arrows between scripts that broadcast and receive messages"""
+    def _add_curved_connections(self, connections, show_message_names=True, cells=None):
+        """Add curved arrows between scripts that broadcast and receive messages
+        
+        Args:
+            cells: Optional set of visible (sprite, event) cells; edges with
+                neither end in one of them are skipped
+        """
         for source_sprite, source_event, target_sprite, target_event in connections:
             if source_sprite and source_event and target_event:
                 # Find the source cell - use first script in the cell
-                source_key = next((k for k in self.cell_contents.keys() 
-                                  if k[0] == source_sprite and k[1] == source_event), None)
+                source_cells = self.cell_index.get((source_sprite, source_event))
                 
-                if source_key:
-                    source_x, source_y = self.cell_contents[source_key]
+                if source_cells:
+                    source_x, source_y = source_cells[0]
                     
                     # For broadcast messages, draw arrows to all receiving scripts
                     receivers_found = False
-                    for sprite in self.sprite_positions:
-                        # Find all scripts that receive this message
-                        receive_keys = [k for k in self.cell_contents.keys() 
-                                      if k[0] == sprite and k[1] == target_event]
-                        
-                        for receive_key in receive_keys:
+                    culled = cells is not None and (source_sprite, source_event) not in cells
+                    for sprite, receive_cells in self.event_index.get(target_event, ()):
+                        if culled and (sprite, target_event) not in cells:
+                            # Neither end of this edge is in view
+                            receivers_found = True
+                            continue
+                        # All scripts of this sprite that receive this message
+                        for target_x, target_y in receive_cells:
                             receivers_found = True
-                            target_x, target_y = self.cell_contents[receive_key]
                             
                             # Calculate curvature based on distance
                             dx = target_x - source_x
@@ -425,27 +937,34 @@ class CodeOramaVisualizer:
                             bbox=dict(boxstyle="round,pad=0.2", fc="white", ec="red", alpha=0.7)
                         )
     
-    def _add_improved_connections(self, connections, show_message_names=True):
-        """Add improved arrows that route around nodes between scripts"""
+    def _add_improved_connections(self, connections, show_message_names=True, cells=None):
+        """Add improved arrows that route around nodes between scripts
+        
+        All routed edges are drawn as one PathCollection and all arrowheads
+        as one PolyCollection; message labels are batched by _draw_labels.
+        Edges with neither end in the optional set of visible cells are skipped.
+        """
+        edge_paths = []
+        arrowheads = []
         for source_sprite, source_event, target_sprite, target_event in connections:
             if source_sprite and source_event and target_event:
                 # Find the source cell - use first script in the cell
-                source_key = next((k for k in self.cell_contents.keys() 
-                                  if k[0] == source_sprite and k[1] == source_event), None)
+                source_cells = self.cell_index.get((source_sprite, source_event))
                 
-                if source_key:
-                    source_x, source_y = self.cell_contents[source_key]
+                if source_cells:
+                    source_x, source_y = source_cells[0]
                     
                     # For broadcast messages, draw arrows to all receiving scripts
                     receivers_found = False
-                    for sprite in self.sprite_positions:
-                        # Find all scripts that receive this message
-                        receive_keys = [k for k in self.cell_contents.keys() 
-                                      if k[0] == sprite and k[1] == target_event]
-                        
-                        for receive_key in receive_keys:
+                    culled = cells is not None and (source_sprite, source_event) not in cells
+                    for sprite, receive_cells in self.event_index.get(target_event, ()):
+                        if culled and (sprite, target_event) not in cells:
+                            # Neither end of this edge is in view
+                            receivers_found = True
+                            continue
+                        # All scripts of this sprite that receive this message
+                        for target_x, target_y in receive_cells:
                             receivers_found = True
-                            target_x, target_y = self.cell_contents[receive_key]
                             
                             # Calculate positions in the grid
                             source_col = self.sprite_positions[source_sprite]
@@ -484,24 +1003,24 @@ class CodeOramaVisualizer:
                             
                             path_points.append((target_x, target_y))  # End
                             
-                            # Create a smooth path
-                            codes = [Path.MOVETO]
-                            for _ in range(len(path_points) - 2):
-                                codes.append(Path.CURVE4)
-                            codes.append(Path.LINETO)
+                            # Create a smooth path: one cubic curve through the
+                            # first routing points, then straight into the target.
+                            # A CURVE4 run must come in threes, or Agg fills the
+                            # missing control point with the canvas origin
+                            codes = [Path.MOVETO] + [Path.CURVE4] * 3
+                            codes += [Path.LINETO] * (len(path_points) - len(codes))
                             
-                            # Draw the path
-                            path = Path(path_points, codes)
-                            patch = patches.PathPatch(path, facecolor='none', 
-                                                     edgecolor='red', lw=1.5, alpha=0.8)
-                            self.ax.add_patch(patch)
+                            # Queue the path
+                            edge_paths.append(Path(path_points, codes))
                             
-                            # Add arrow at the end
+                            # Add arrow at the end, shaped like ax.arrow would draw it
                             end_x, end_y = path_points[-1]
                             prev_x, prev_y = path_points[-2]
                             dx, dy = end_x - prev_x, end_y - prev_y
-                            self.ax.arrow(end_x - 0.1*dx, end_y - 0.1*dy, 0.07*dx, 0.07*dy,
-                                         head_width=0.1, head_length=0.1, fc='red', ec='red')
+                            arrow = patches.FancyArrow(end_x - 0.1*dx, end_y - 0.1*dy, 0.07*dx, 0.07*dy,
+                                                       head_width=0.1, head_length=0.1)
+                            if len(arrow.get_xy()):
+                                arrowheads.append(arrow.get_xy())
                             
                             # Add message name if enabled
                             if show_message_names and target_event.startswith('receive_'):
@@ -509,19 +1028,24 @@ class CodeOramaVisualizer:
                                 # Place the text at a good point along the path
                                 if len(path_points) > 3:
                                     text_point = path_points[len(path_points) // 2]
-                                    self.ax.text(text_point[0], text_point[1], message, fontsize=7,
-                                               ha='center', va='center', 
-                                               bbox=dict(boxstyle="round,pad=0.3", 
-                                                        fc="white", ec="gray", alpha=0.7))
+                                    self._add_label(text_point[0], text_point[1], message, 7,
+                                                    zorder=3.5, box=('white', 'gray', 0.3))
                     
                     # If no receivers for this message, add a note
                     if not receivers_found:
-                        self.ax.text(
+                        self._add_label(
                             source_x + 0.1, source_y - 0.1,
-                            f"Broadcasts: {target_event.replace('receive_', '')}",
-                            fontsize=8, color='red', ha='left', va='top',
-                            bbox=dict(boxstyle="round,pad=0.2", fc="white", ec="red", alpha=0.7)
+                            f"Broadcasts: {target_event.replace('receive_', '')}", 8,
+                            color='red', ha='left', va='top', zorder=3.5, box=('white', 'red', 0.2)
                         )
+        
+        if edge_paths:
+            edges = PathCollection(edge_paths, facecolors='none', edgecolors='red',
+                                   linewidths=1.5, alpha=0.8)
+            self.ax.add_collection(edges, autolim=False)
+        if arrowheads:
+            heads = PolyCollection(arrowheads, facecolors='red', edgecolors='red', linewidths=1)
+            self.ax.add_collection(heads, autolim=False)
     
     def _get_event_color(self, event):
         """Get appropriate color for an event type"""
@@ -0,0 +1,64 @@
+import os
+
+from model import ChangeSet
+from parser import ScratchParser
+
+
+class ProjectWatcher:
+    """Watches an .sb3 file and incrementally re-parses it when it changes
+
+    Each target's blocks are fingerprinted, so after an edit only the
+    targets whose blocks changed are processed again. Every poll that
+    finds changes replaces self.model with a new model and returns the
+    ChangeSet describing them.
+    """
+
+    def __init__(self, file_path, parser=None):
+        self.file_path = file_path
+        self.parser = parser or ScratchParser(hash_targets=True)
+        self.model = None
+        self._signature = None
+
+    def load(self):
+        """Parse the file from scratch; returns True on success"""
+        signature = self._stat()
+        model = self.parser.parse_sb3(self.file_path)
+        if model is None:
+            return False
+        self.model = model
+        self._signature = signature
+        return True
+
+    def poll(self):
+        """Re-parse if the file changed since the last check
+
+        Returns a ChangeSet when the project changed, otherwise None.
+        """
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return None
+        if self.model is None:
+            # Initial load failed earlier; report everything as new once it works
+            if not self.load():
+                return None
+            return ChangeSet(added_sprites=self.model.sprites, added_events=self.model.events)
+
+        result = self.parser.reparse_sb3(self.file_path, self.model)
+        if result is None:
+            # Probably caught the file mid-save; try again on the next poll
+            return None
+        self._signature = signature
+        
+        model, changes = result
+        if not changes:
+            return None
+        self.model = model
+        return changes
+
+    def _stat(self):
+        """Return (mtime, size) of the watched file, or None if it is missing"""
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)